@@ -1,64 +1,295 @@
 # auth.py
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List, Deque
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cache
+import atexit
 import sqlite3
 import bcrypt
-import json
-import datetime
+import hashlib
+import hmac
+import os
+import random
+import threading
+import time
 
-from app.backend.db.db import get_conn
+from app.backend.db.db import audit_details, get_conn
 
 # --- Konfiguration ---
 MAX_FAILED_ATTEMPTS = 5          # nach so vielen Fehlversuchen sperren
 LOCKOUT_MINUTES = 15             # Sperrdauer in Minuten
 BCRYPT_ROUNDS = 12               # Kostenfaktor für neue Passwörter
 
-# Dummy-Hash gegen Benutzer-Enumeration und Timing-Unterschiede
+# --- SQL ---
+# Feste Statement-Texte: sqlite3 cached vorbereitete Statements pro Verbindung anhand des Textes.
+_SQL_GET_USER = "SELECT id, role, clinics, password_hash FROM users WHERE username = ?"
+_SQL_COUNT_ATTEMPTS = (
+    "SELECT COUNT(*) FROM ("
+    " SELECT 1 FROM login_attempts WHERE user_id = ? AND attempt_time > ? LIMIT ?"
+    ")"
+)
+_SQL_ADD_ATTEMPT = "INSERT INTO login_attempts(user_id, attempt_time) VALUES (?, ?)"
+_SQL_CLEAR_ATTEMPTS = "DELETE FROM login_attempts WHERE user_id = ?"
+_SQL_EXPIRE_ATTEMPTS = "DELETE FROM login_attempts WHERE attempt_time <= ?"
+_SQL_AUDIT = "INSERT INTO audit_log(user_id, action, entity, details) VALUES(?,?,?,?)"
+_SQL_AUDIT_ENTITY = "INSERT INTO audit_log(user_id, action, entity, entity_id, details) VALUES(?,?,?,?,?)"
+_SQL_AUDIT_DELETE = "INSERT INTO audit_log(user_id, action, entity, entity_id) VALUES(?,?,?,?)"
+_SQL_LIST_USERS = "SELECT id, username, role, clinics FROM users ORDER BY username COLLATE NOCASE"
+_SQL_ADD_USER = "INSERT INTO users(username, password_hash, role, clinics) VALUES(?,?,?,?)"
+_SQL_UPDATE_CLINICS = "UPDATE users SET clinics=? WHERE id=?"
+_SQL_DELETE_USER = "DELETE FROM users WHERE id=?"
+
+# Dummy-Passwort gegen Benutzer-Enumeration und Timing-Unterschiede
 _DUMMY_PASSWORD = b"__dummy_password_for_timing__"
-_DUMMY_HASH = bcrypt.hashpw(_DUMMY_PASSWORD, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+# bcrypt wertet nur die ersten 72 Byte aus und kennt nur diese Hash-Präfixe
+_BCRYPT_MAX_PASSWORD_BYTES = 72
+_BCRYPT_PREFIXES = (b"$2a$", b"$2b$", b"$2y$")
+
+# Worker für bcrypt-Hashing (bcrypt gibt den GIL frei, Threads nutzen also mehrere Kerne)
+_BCRYPT_POOL: Optional[ThreadPoolExecutor] = None
+_BCRYPT_POOL_LOCK = threading.Lock()
+
+# Puffer für Fehlversuche (user_id, attempt_time), wird gebündelt in login_attempts geschrieben
+_ATTEMPT_FLUSH_SIZE = 64         # spätestens ab so vielen Einträgen schreiben
+_ATTEMPT_FLUSH_SECONDS = 1.0     # sonst spätestens nach dieser Zeit
+_attempt_buffer: Deque[Tuple[int, int]] = deque()
+_attempt_lock = threading.Lock()
+# Hält den Puffer und das Schreiben nach login_attempts zusammen: Ein Flush läuft nie
+# gleichzeitig mit dem Zählen der Fehlversuche oder ihrem Löschen nach erfolgreicher Anmeldung.
+_attempt_flush_lock = threading.Lock()
+# Ein einziger Hintergrund-Thread für verzögerte Flushes, er behält seine DB-Verbindung
+_attempt_wakeup = threading.Event()
+_attempt_worker: Optional[threading.Thread] = None
+
+# Cache für erfolgreiche Passwortprüfungen: (user_id, HMAC(passwort), hash) -> ablaufzeit.
+# Der HMAC-Schlüssel wird pro Prozess zufällig erzeugt, der Cache enthält also keine
+# Passwort-Digests, die sich außerhalb des Prozesses nachrechnen ließen.
+_VERIFY_CACHE_SIZE = 1024
+_VERIFY_CACHE_KEY = os.urandom(32)
+_verify_cache: "OrderedDict[Tuple[int, bytes, bytes], float]" = OrderedDict()
+_verify_cache_lock = threading.Lock()  # authenticate läuft auch aus mehreren Threads
 
 
 # ---------- Hilfsfunktionen ----------
 
-def _ensure_login_attempts_table(conn: sqlite3.Connection) -> None:
-    """Legt die Tabelle für Login-Versuche an, falls sie fehlt."""
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS login_attempts (
-        id INTEGER PRIMARY KEY,
-        user_id INTEGER,
-        attempt_time TEXT NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-    )
-    """)
+@cache
+def _dummy_hash() -> bytes:
+    """Erzeugt den Dummy-Hash erst beim ersten Bedarf statt beim Import."""
+    return bcrypt.hashpw(_DUMMY_PASSWORD, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+
+@cache
+def _dummy_verify_seconds() -> float:
+    """Misst einmalig, wie lange eine bcrypt-Prüfung mit BCRYPT_ROUNDS dauert (Mittel aus 3 Läufen)."""
+    hashed = _dummy_hash()
+    start = time.perf_counter()
+    for _ in range(3):
+        bcrypt.checkpw(_DUMMY_PASSWORD, hashed)
+    return (time.perf_counter() - start) / 3
+
+
+def _dummy_verify(password: str) -> None:
+    """
+    Ersatz für die Passwortprüfung bei unbekanntem Benutzer.
+    Statt bcrypt zu rechnen, wird so lange gewartet, wie eine echte Prüfung dauert (leicht gestreut).
+    So kosten Enumerationsversuche keine CPU, die Laufzeit bleibt trotzdem vergleichbar.
+    """
+    hmac.compare_digest(password.encode("utf-8")[:_BCRYPT_MAX_PASSWORD_BYTES], _DUMMY_PASSWORD)
+    t = _dummy_verify_seconds()
+    time.sleep(max(0.0, random.gauss(t, t * 0.05)))
+
+
+def _bcrypt_pool() -> ThreadPoolExecutor:
+    """Liefert den Worker-Pool für bcrypt, legt ihn beim ersten Aufruf an."""
+    global _BCRYPT_POOL
+    with _BCRYPT_POOL_LOCK:
+        if _BCRYPT_POOL is None:
+            _BCRYPT_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 2,
+                thread_name_prefix="bcrypt",
+            )
+        return _BCRYPT_POOL
+
+
+def _hash_password(password: str) -> bytes:
+    """Erzeugt einen bcrypt-Hash mit BCRYPT_ROUNDS."""
+    pw_bytes = password.encode("utf-8")[:_BCRYPT_MAX_PASSWORD_BYTES]
+    return bcrypt.hashpw(pw_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+
+def hash_password_async(password: str) -> "Future[bytes]":
+    """
+    Berechnet den bcrypt-Hash im Worker-Pool.
+    Für Aufrufer, die nicht blockieren dürfen, zum Beispiel der Qt-Hauptthread.
+    """
+    return _bcrypt_pool().submit(_hash_password, password)
 
 
-def _audit(conn: sqlite3.Connection, user_id: Optional[int], action: str, details: Dict) -> None:
+def _verify_cached(user_id: int, password: str, hash_bytes: bytes) -> bool:
     """
-    Schreibt einen Eintrag ins Audit-Log.
+    Prüft das Passwort gegen den bcrypt-Hash und merkt sich erfolgreiche Prüfungen.
+    Fehlschläge werden nie gespeichert: Jeder falsche Versuch kostet eine volle bcrypt-Prüfung,
+    genau wie bei unbekannten Benutzern (siehe _dummy_verify).
+    Der Schlüssel enthält den gespeicherten Hash, ein geändertes Passwort trifft also nie
+    einen alten Eintrag. Einträge verfallen zusätzlich nach LOCKOUT_MINUTES.
+    """
+    pw_bytes = password.encode("utf-8")[:_BCRYPT_MAX_PASSWORD_BYTES]
+    key = (user_id, hmac.new(_VERIFY_CACHE_KEY, pw_bytes, hashlib.sha256).digest(), bytes(hash_bytes))
+    now = time.monotonic()
+
+    with _verify_cache_lock:
+        expires = _verify_cache.get(key)
+        if expires is not None and expires > now:
+            _verify_cache.move_to_end(key)
+            return True
+
+    if hash_bytes[:4] not in _BCRYPT_PREFIXES:
+        # kein bcrypt-Hash (z. B. Altbestand), gar nicht erst prüfen
+        return False
+    try:
+        ok = bcrypt.checkpw(pw_bytes, hash_bytes)
+    except ValueError:
+        return False  # Präfix passt, Rest ist aber kein gültiger Hash
+
+    if ok:
+        with _verify_cache_lock:
+            _verify_cache[key] = now + LOCKOUT_MINUTES * 60
+            _verify_cache.move_to_end(key)
+            while len(_verify_cache) > _VERIFY_CACHE_SIZE:
+                _verify_cache.popitem(last=False)
+    return ok
+
+
+def clear_verify_cache() -> None:
+    """Leert den Cache der Passwortprüfungen, z. B. nach Passwortänderungen."""
+    with _verify_cache_lock:
+        _verify_cache.clear()
+
+
+# Schreiboperation als (SQL, Parameter), wird gesammelt und gebündelt ausgeführt
+_WriteOp = Tuple[str, tuple]
+
+
+def _audit(user_id: Optional[int], action: str, details: Dict) -> _WriteOp:
+    """
+    Baut einen Eintrag fürs Audit-Log.
     'user_id' ist optional und verweist auf den Benutzer, der die Aktion ausgelöst hat.
     """
-    conn.execute(
-        "INSERT INTO audit_log(user_id, action, entity, details) VALUES(?,?,?,?)",
-        (user_id, action, "user", json.dumps(details, ensure_ascii=False))
+    return (
+        _SQL_AUDIT,
+        (user_id, action, "user", audit_details(details)),
     )
 
 
-def _failed_attempts_count(conn: sqlite3.Connection, user_id: int, since_minutes: int) -> int:
-    """Zählt fehlgeschlagene Versuche eines Nutzers innerhalb der letzten 'since_minutes' Minuten."""
-    cutoff = (datetime.datetime.utcnow() - datetime.timedelta(minutes=since_minutes)).isoformat()
-    cur = conn.execute(
-        "SELECT COUNT(*) FROM login_attempts WHERE user_id = ? AND attempt_time > ?",
-        (user_id, cutoff)
-    )
-    return cur.fetchone()[0]
+def _run_writes(conn: sqlite3.Connection, ops: List[_WriteOp]) -> None:
+    """
+    Führt alle gesammelten Schreiboperationen in genau einer Transaktion aus.
+    Fehler beim Protokollieren dürfen die Anmeldung nicht verhindern.
+    """
+    if not ops:
+        return
+    try:
+        with conn:
+            for sql, params in ops:
+                conn.execute(sql, params)
+    except Exception:
+        pass
 
 
-def _add_failed_attempt(conn: sqlite3.Connection, user_id: int) -> None:
-    """Protokolliert einen fehlgeschlagenen Versuch für 'user_id'."""
-    now = datetime.datetime.utcnow().isoformat()
-    conn.execute(
-        "INSERT INTO login_attempts(user_id, attempt_time) VALUES (?, ?)",
-        (user_id, now)
-    )
+def _lockout_cutoff(since_minutes: int = LOCKOUT_MINUTES) -> int:
+    """Zeitpunkt, ab dem Fehlversuche für den Lockout zählen (Unix-Sekunden)."""
+    return int(time.time()) - since_minutes * 60
+
+
+def _failed_attempts_count(
+    conn: sqlite3.Connection,
+    user_id: int,
+    cutoff: int,
+    limit: int = MAX_FAILED_ATTEMPTS,
+) -> int:
+    """
+    Zählt fehlgeschlagene Versuche eines Nutzers seit 'cutoff' (siehe _lockout_cutoff).
+    Es wird höchstens bis 'limit' gezählt: Für den Lockout reicht die Schwelle,
+    und bei vielen Fehlversuchen bricht der Scan so früh ab.
+    """
+    return conn.execute(_SQL_COUNT_ATTEMPTS, (user_id, cutoff, limit)).fetchone()[0]
+
+
+def _record_failed_attempt(user_id: int) -> None:
+    """
+    Merkt einen fehlgeschlagenen Versuch im Speicher vor.
+    Geschrieben wird gebündelt, sobald der Puffer voll ist oder spätestens
+    nach _ATTEMPT_FLUSH_SECONDS durch den Hintergrund-Thread.
+    """
+    global _attempt_worker
+    with _attempt_lock:
+        _attempt_buffer.append((user_id, int(time.time())))
+        full = len(_attempt_buffer) >= _ATTEMPT_FLUSH_SIZE
+        if not full:
+            if _attempt_worker is None:
+                _attempt_worker = threading.Thread(
+                    target=_attempt_flush_loop, name="login-attempts", daemon=True
+                )
+                _attempt_worker.start()
+            _attempt_wakeup.set()
+    if full:
+        _flush_failed_attempts()
+
+
+def _attempt_flush_loop() -> None:
+    """Wartet auf vorgemerkte Fehlversuche und schreibt sie nach kurzer Sammelzeit."""
+    while True:
+        _attempt_wakeup.wait()
+        time.sleep(_ATTEMPT_FLUSH_SECONDS)
+        _attempt_wakeup.clear()
+        _flush_failed_attempts()
+
+
+def _pending_failed_attempts(user_id: int, cutoff: int) -> int:
+    """Zählt noch nicht geschriebene Fehlversuche eines Nutzers seit 'cutoff'."""
+    with _attempt_lock:
+        return sum(1 for uid, ts in _attempt_buffer if uid == user_id and ts > cutoff)
+
+
+def _discard_failed_attempts(user_id: int) -> None:
+    """
+    Verwirft vorgemerkte Fehlversuche eines Nutzers (nach erfolgreicher Anmeldung).
+    Aufrufer halten _attempt_flush_lock, damit kein laufender Flush sie danach noch schreibt.
+    """
+    with _attempt_lock:
+        keep = [a for a in _attempt_buffer if a[0] != user_id]
+        _attempt_buffer.clear()
+        _attempt_buffer.extend(keep)
+
+
+def _flush_failed_attempts() -> None:
+    """
+    Schreibt alle vorgemerkten Fehlversuche in einer Transaktion.
+    Dabei werden abgelaufene Versuche entfernt, damit Tabelle und Index
+    nur das Lockout-Fenster enthalten.
+    """
+    with _attempt_flush_lock:
+        with _attempt_lock:
+            batch = list(_attempt_buffer)
+            _attempt_buffer.clear()
+        if not batch:
+            return
+        try:
+            conn = get_conn()
+            with conn:
+                conn.executemany(_SQL_ADD_ATTEMPT, batch)
+                conn.execute(_SQL_EXPIRE_ATTEMPTS, (_lockout_cutoff(),))
+        except Exception:
+            # DB gerade nicht verfügbar: Einträge behalten, der Hintergrund-Thread versucht es erneut
+            with _attempt_lock:
+                _attempt_buffer.extendleft(reversed(batch))
+                if _attempt_worker is not None:
+                    _attempt_wakeup.set()
+
+
+# Beim Beenden nichts verlieren
+atexit.register(_flush_failed_attempts)
 
 
 # ---------- Öffentliche Funktionen ----------
@@ -72,69 +303,71 @@ def authenticate(username: str, password: str) -> Optional[Tuple[int, str, str]]
       - None bei Fehlschlag oder Lockout
 
     Hinweise:
-    - Schutz gegen Benutzer-Enumeration: Passwortprüfung erfolgt auch, wenn der Benutzer nicht existiert,
-      dann mit einem Dummy-Hash. So bleiben Laufzeiten vergleichbar.
+    - Schutz gegen Benutzer-Enumeration: Existiert der Benutzer nicht, wird so lange gewartet,
+      wie eine echte bcrypt-Prüfung dauert. So bleiben Laufzeiten vergleichbar.
     - Lockout greift nur für tatsächlich existierende Benutzer.
     """
-    with get_conn() as conn:
-        _ensure_login_attempts_table(conn)
-
-        # Benutzer abrufen
-        cur = conn.execute(
-            "SELECT id, role, clinics, password_hash FROM users WHERE username = ?",
-            (username,)
-        )
-        row = cur.fetchone()
-
-        # Lockout prüfen (nur bei existierendem Benutzer)
-        user_id = row[0] if row else None
-        if user_id is not None:
-            if _failed_attempts_count(conn, user_id, LOCKOUT_MINUTES) >= MAX_FAILED_ATTEMPTS:
-                # freundliche Protokollierung
-                try:
-                    _audit(conn, user_id, "login_blocked", {"username": username, "reason": "too_many_attempts"})
-                except Exception:
-                    pass
-                return None
-
-        # Passwort prüfen — immer durchführen (Dummy-Hash, wenn Benutzer nicht existiert)
-        hash_to_check = row[3] if row else _DUMMY_HASH
-        hash_bytes = hash_to_check.encode("utf-8") if isinstance(hash_to_check, str) else hash_to_check
+    conn = get_conn()
+    writes: List[_WriteOp] = []
+    result: Optional[Tuple[int, str, str]] = None
+
+    # Benutzer abrufen
+    row = conn.execute(_SQL_GET_USER, (username,)).fetchone()
+
+    # Lockout prüfen (nur bei existierendem Benutzer).
+    # Unterhalb der Schwelle ist der begrenzte Zählwert exakt und dient auch dem Audit.
+    user_id = row[0] if row else None
+    failed_before = 0
+    if user_id is not None:
+        cutoff = _lockout_cutoff()
+        # Ein laufender Flush hat seine Versuche schon aus dem Puffer genommen, aber noch nicht
+        # geschrieben; erst nach seinem Commit zählen, sonst fehlen sie an beiden Stellen.
+        with _attempt_flush_lock:
+            failed_before = min(
+                MAX_FAILED_ATTEMPTS,
+                _failed_attempts_count(conn, user_id, cutoff) + _pending_failed_attempts(user_id, cutoff),
+            )
 
-        try:
-            ok = bcrypt.checkpw(password.encode("utf-8"), hash_bytes)
-        except Exception:
+    if failed_before >= MAX_FAILED_ATTEMPTS:
+        # freundliche Protokollierung
+        writes.append(_audit(user_id, "login_blocked", {"username": username, "reason": "too_many_attempts"}))
+    else:
+        # Passwort prüfen — bei unbekanntem Benutzer nur gleich lange warten
+        if row:
+            hash_to_check = row[3]
+            hash_bytes = hash_to_check.encode() if isinstance(hash_to_check, str) else bytes(hash_to_check)
+            ok = _verify_cached(user_id, password, hash_bytes)
+        else:
+            _dummy_verify(password)
             ok = False
 
         if ok and row:
             # Erfolg: protokollieren und Fehlversuche bereinigen
-            try:
-                _audit(conn, row[0], "login_success", {"username": username})
-                conn.execute("DELETE FROM login_attempts WHERE user_id = ?", (row[0],))
-            except Exception:
-                pass
-            return (row[0], row[1], row[2])
-
-        # Fehlschlag: protokollieren (wenn Benutzer existiert inkl. Zähler)
-        try:
-            if row:
-                _add_failed_attempt(conn, row[0])
-                attempts = _failed_attempts_count(conn, row[0], LOCKOUT_MINUTES)
-                _audit(conn, row[0], "login_failure", {"username": username, "attempts_last_minutes": attempts})
-            else:
-                _audit(conn, None, "login_failure", {"username": username})
-        except Exception:
-            pass
-
-        return None
+            writes.append(_audit(user_id, "login_success", {"username": username}))
+            writes.append((_SQL_CLEAR_ATTEMPTS, (user_id,)))
+            result = (row[0], row[1], row[2])
+        elif row:
+            # Fehlschlag bei existierendem Benutzer inkl. Zähler
+            _record_failed_attempt(user_id)
+            attempts = failed_before + 1  # der soeben protokollierte Versuch
+            writes.append(_audit(user_id, "login_failure", {"username": username, "attempts_last_minutes": attempts}))
+        else:
+            writes.append(_audit(None, "login_failure", {"username": username}))
+
+    # höchstens eine Transaktion pro Anmeldeversuch
+    if result is not None:
+        # Puffer verwerfen und Tabelle leeren, ohne dass ein Flush dazwischen schreibt
+        with _attempt_flush_lock:
+            _discard_failed_attempts(result[0])
+            _run_writes(conn, writes)
+    else:
+        _run_writes(conn, writes)
+    return result
 
 
 def list_users():
-    """Gibt (id, username, role, clinics) sortiert zurück. Verbindung wird sauber geschlossen."""
-    with get_conn() as conn:
-        return conn.execute(
-            "SELECT id, username, role, clinics FROM users ORDER BY username COLLATE NOCASE"
-        ).fetchall()
+    """Gibt (id, username, role, clinics) sortiert zurück (über die Thread-Verbindung aus get_conn)."""
+    return get_conn().execute(_SQL_LIST_USERS).fetchall()
 
 
 def add_user(
@@ -148,19 +381,20 @@ def add_user(
     Legt einen neuen Benutzer an und protokolliert dies im Audit-Log.
     'performed_by_user_id' ist optional und verweist auf den Administrator, der den Benutzer angelegt hat.
     """
+    clear_verify_cache()
     with get_conn() as conn:
-        ph = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+        ph = _hash_password(password)
         conn.execute(
-            "INSERT INTO users(username, password_hash, role, clinics) VALUES(?,?,?,?)",
+            _SQL_ADD_USER,
             (username, ph, role, clinics)
         )
         conn.execute(
-            "INSERT INTO audit_log(user_id, action, entity, details) VALUES(?,?,?,?)",
+            _SQL_AUDIT,
             (
                 performed_by_user_id,
                 "user_create",
                 "user",
-                json.dumps({"username": username, "role": role, "clinics": clinics}, ensure_ascii=False),
+                audit_details({"username": username, "role": role, "clinics": clinics}),
             )
         )
 
@@ -175,15 +409,15 @@ def update_user_clinics(
     'performed_by_user_id' ist optional und verweist auf den Ausführenden.
     """
     with get_conn() as conn:
-        conn.execute("UPDATE users SET clinics=? WHERE id=?", (clinics, user_id))
+        conn.execute(_SQL_UPDATE_CLINICS, (clinics, user_id))
         conn.execute(
-            "INSERT INTO audit_log(user_id, action, entity, entity_id, details) VALUES(?,?,?,?,?)",
+            _SQL_AUDIT_ENTITY,
             (
                 performed_by_user_id,
                 "user_update",
                 "user",
                 user_id,
-                json.dumps({"clinics": clinics}, ensure_ascii=False),
+                audit_details({"clinics": clinics}),
             )
         )
 
@@ -197,8 +431,8 @@ def delete_user(
     'performed_by_user_id' ist optional und verweist auf den Ausführenden.
     """
     with get_conn() as conn:
-        conn.execute("DELETE FROM users WHERE id=?", (user_id,))
+        conn.execute(_SQL_DELETE_USER, (user_id,))
         conn.execute(
-            "INSERT INTO audit_log(user_id, action, entity, entity_id) VALUES(?,?,?,?)",
+            _SQL_AUDIT_DELETE,
             (performed_by_user_id, "user_delete", "user", user_id)
         )
@@ -1,12 +1,15 @@
 # db.py
 from __future__ import annotations
 
+import atexit
 import json
 import sqlite3
+import threading
+import time
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Optional, Set, Tuple
 
 import bcrypt
 
@@ -64,8 +67,47 @@ CREATE TABLE IF NOT EXISTS audit_log (
     details TEXT,
     FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE SET NULL
 );
+
+CREATE TABLE IF NOT EXISTS login_attempts (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    attempt_time INTEGER NOT NULL, -- Unix-Zeit in Sekunden (UTC)
+    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
 """
 
+# Volltextindex fuer die Audit-Suche. Der Trigram-Tokenizer findet beliebige Teilstrings
+# ab drei Zeichen ohne Beachtung der Gross-/Kleinschreibung, wie die bisherige Suche.
+# Inhalt liegt nur in audit_log (content=...), Trigger halten den Index aktuell.
+AUDIT_FTS_SCHEMA: Tuple[str, ...] = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS audit_fts USING fts5(
+        ts, action, entity, details,
+        content='audit_log', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_fts_ai AFTER INSERT ON audit_log BEGIN
+        INSERT INTO audit_fts(rowid, ts, action, entity, details)
+        VALUES (new.id, new.ts, new.action, new.entity, new.details);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_fts_ad AFTER DELETE ON audit_log BEGIN
+        INSERT INTO audit_fts(audit_fts, rowid, ts, action, entity, details)
+        VALUES ('delete', old.id, old.ts, old.action, old.entity, old.details);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_fts_au AFTER UPDATE ON audit_log BEGIN
+        INSERT INTO audit_fts(audit_fts, rowid, ts, action, entity, details)
+        VALUES ('delete', old.id, old.ts, old.action, old.entity, old.details);
+        INSERT INTO audit_fts(rowid, ts, action, entity, details)
+        VALUES (new.id, new.ts, new.action, new.entity, new.details);
+    END
+    """,
+)
+
 SEED_USERS: List[Tuple[str, str, str, str]] = [
     ("admin", "admin", ROLE_ADMIN, ALL_CLINICS_SENTINEL),
     ("tech", "tech", ROLE_TECH, "Neuro"),
@@ -74,26 +116,75 @@ SEED_USERS: List[Tuple[str, str, str, str]] = [
 
 SEED_CLINICS: List[str] = ["Neuro", "Viszeral", "Thorax", "Ortho"]
 
+# Datenbanken, fuer die Schema und Migrationen in diesem Prozess bereits liefen
+_initialized_paths: Set[str] = set()
+_init_lock = threading.Lock()
+
+# Eine langlebige Verbindung pro Thread (behält Statement-Cache und PRAGMAs)
+_thread_local = threading.local()
+
+# Encoder für Audit-Details: einmal angelegt, kompakte Trenner, Umlaute bleiben lesbar
+_DETAILS_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def audit_details(details: dict) -> str:
+    """Serialisiert die Details eines Audit-Eintrags als kompaktes JSON."""
+    return _DETAILS_ENCODER.encode(details)
+
 
 def _hash_password(plain: str) -> bytes:
     """Erzeugt einen bcrypt-Hash aus dem Klartextpasswort."""
     return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt())
 
 
-def get_conn() -> sqlite3.Connection:
+def _migrate_login_attempts(conn: sqlite3.Connection) -> None:
     """
-    Stellt die Verbindung her, sorgt für sinnvolle PRAGMAs
-    und fuehrt Schema, Migrationen, Indizes und Seed-Daten aus.
+    Stellt login_attempts.attempt_time von ISO-Text auf Unix-Sekunden (INTEGER) um.
+    Ganzzahlvergleiche sind schneller und erlauben enge Bereichsscans über den Index.
     """
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, timeout=5.0, check_same_thread=False)
-
-    # Wichtige PRAGMAs früh setzen
-    conn.execute("PRAGMA journal_mode=WAL;")       # bessere Parallelitaet
+    info = conn.execute("PRAGMA table_info(login_attempts)").fetchall()
+    col_type = {r[1]: (r[2] or "").upper() for r in info}.get("attempt_time")
+    if col_type is None or col_type == "INTEGER":
+        return
+
+    conn.execute("DROP INDEX IF EXISTS idx_login_attempts_user_time")
+    conn.execute("ALTER TABLE login_attempts RENAME TO login_attempts_old")
+    conn.execute("""
+        CREATE TABLE login_attempts (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            attempt_time INTEGER NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("""
+        INSERT INTO login_attempts(id, user_id, attempt_time)
+        SELECT id, user_id, CAST(strftime('%s', attempt_time) AS INTEGER)
+        FROM login_attempts_old
+        WHERE strftime('%s', attempt_time) IS NOT NULL
+          AND (user_id IS NULL OR user_id IN (SELECT id FROM users))
+    """)
+    conn.execute("DROP TABLE login_attempts_old")
+
+
+def _connect() -> sqlite3.Connection:
+    """Öffnet eine Verbindung und setzt die PRAGMAs, die pro Verbindung gelten."""
+    conn = sqlite3.connect(DB_PATH, timeout=5.0, check_same_thread=False, cached_statements=256)
     conn.execute("PRAGMA foreign_keys=ON;")        # Fremdschluessel erzwingen
     conn.execute("PRAGMA busy_timeout=5000;")      # Geduld bei Locks
     conn.execute("PRAGMA synchronous=NORMAL;")     # Vernuenftige Balance Haltbarkeit/Tempo
     conn.execute("PRAGMA temp_store=MEMORY;")      # temporaere Daten in RAM
+    conn.execute("PRAGMA cache_size=-20000;")      # ca. 20 MB Seitencache pro Verbindung
+    return conn
+
+
+def _init_db(conn: sqlite3.Connection) -> None:
+    """
+    Fuehrt Schema, Migrationen, Indizes und Seed-Daten aus.
+    Wird pro Prozess und Datenbankpfad nur einmal aufgerufen (siehe get_conn).
+    """
+    # journal_mode gilt fuer die ganze Datenbankdatei, nicht pro Verbindung
+    conn.execute("PRAGMA journal_mode=WAL;")       # bessere Parallelitaet
 
     with conn:
         # Schema idempotent anwenden
@@ -120,37 +211,141 @@ def get_conn() -> sqlite3.Connection:
         if "closed_by" not in cols_cases:
             conn.execute("ALTER TABLE cases ADD COLUMN closed_by TEXT")
 
+        _migrate_login_attempts(conn)
+
         # Hilfreiche Indizes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_clinic ON cases(clinic)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_status ON cases(status)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_status_id ON cases(status, id DESC)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cases_status_returned ON cases(status, date_returned, id)"
+        )
         conn.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_login_attempts_user_time ON login_attempts(user_id, attempt_time DESC)"
+        )
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log(user_id)")
+        _init_audit_search(conn)
 
         # Seed-Daten nur einmal einspielen
         if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
-            for uname, pwd, role, clinics in SEED_USERS:
-                conn.execute(
-                    "INSERT INTO users(username, password_hash, role, clinics) VALUES(?,?,?,?)",
-                    (uname, _hash_password(pwd), role, clinics),
-                )
+            conn.executemany(
+                "INSERT INTO users(username, password_hash, role, clinics) VALUES(?,?,?,?)",
+                [(uname, _hash_password(pwd), role, clinics) for uname, pwd, role, clinics in SEED_USERS],
+            )
+
+        # INSERT OR IGNORE ist idempotent, eine Vorabprüfung ist nicht nötig
+        conn.executemany(
+            "INSERT OR IGNORE INTO clinics(name) VALUES (?)",
+            [(name,) for name in SEED_CLINICS],
+        )
+
 
-        existing = {row[0] for row in conn.execute("SELECT name FROM clinics").fetchall()}
-        for name in SEED_CLINICS:
-            if name not in existing:
-                conn.execute("INSERT OR IGNORE INTO clinics(name) VALUES (?)", (name,))
+def _init_audit_search(conn: sqlite3.Connection) -> bool:
+    """
+    Legt den Volltextindex fuer das Audit-Log an und fuellt ihn beim ersten Mal.
+    Ohne FTS5 in der SQLite-Version bleibt es bei der einfachen Suche (Rueckgabe False).
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='audit_fts'"
+    ).fetchone() is not None
+    try:
+        for stmt in AUDIT_FTS_SCHEMA:
+            conn.execute(stmt)
+    except sqlite3.OperationalError:
+        return False
+    if not exists:
+        # bestehende Eintraege einmalig uebernehmen
+        conn.execute("INSERT INTO audit_fts(audit_fts) VALUES('rebuild')")
+    return True
+
+
+def _thread_conn(key: str) -> Optional[sqlite3.Connection]:
+    """Liefert die offene Verbindung dieses Threads zu 'key' oder None."""
+    conn = getattr(_thread_local, "conn", None)
+    if conn is None or getattr(_thread_local, "key", None) != key:
+        return None
+    try:
+        conn.total_changes  # wirft ProgrammingError, wenn jemand die Verbindung geschlossen hat
+    except sqlite3.ProgrammingError:
+        return None
+    return conn
+
+
+def _close_thread_conn() -> None:
+    """Schliesst die Verbindung des aufrufenden Threads, falls vorhanden."""
+    conn = getattr(_thread_local, "conn", None)
+    _thread_local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
 
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Liefert die Verbindung des aktuellen Threads und sorgt für sinnvolle PRAGMAs.
+    Die Verbindung bleibt offen und wird bei weiteren Aufrufen wiederverwendet;
+    wurde sie geschlossen, wird neu verbunden.
+    Schema, Migrationen und Seed-Daten laufen nur beim ersten Aufruf pro Prozess.
+    """
+    key = str(DB_PATH)
+    conn = _thread_conn(key)
+    if conn is not None:
+        return conn
+    # Verbindung zu einem alten DB_PATH (oder bereits geschlossene) vor dem Ersetzen schließen
+    _close_thread_conn()
+
+    if key in _initialized_paths:
+        conn = _connect()
+    else:
+        with _init_lock:
+            DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+            conn = _connect()
+            if key not in _initialized_paths:
+                _init_db(conn)
+                _initialized_paths.add(key)
+
+    _thread_local.conn, _thread_local.key = conn, key
     return conn
 
 
+# Verbindung des Hauptthreads beim Beenden schliessen
+atexit.register(_close_thread_conn)
+
+
 # ========= Clinics API =========
 
+# Kliniken aendern sich selten: Liste kurz zwischenspeichern (Datenbankpfad, Zeitpunkt, Namen).
+# Eigene Aenderungen verwerfen den Cache sofort, Aenderungen anderer Clients nach spaetestens TTL.
+_CLINICS_TTL_SECONDS = 30.0
+_clinics_cache: Optional[Tuple[str, float, Tuple[str, ...]]] = None
+
+
+def invalidate_clinics_cache() -> None:
+    """Verwirft die zwischengespeicherte Klinikliste, z. B. nach Anlegen oder Loeschen."""
+    global _clinics_cache
+    _clinics_cache = None
+
+
 def list_clinics() -> List[str]:
-    """Gibt alle Kliniken alphabetisch zurueck."""
+    """Gibt alle Kliniken alphabetisch zurueck (kurzzeitig zwischengespeichert)."""
+    global _clinics_cache
+    key = str(DB_PATH)
+    now = time.monotonic()
+    cached = _clinics_cache
+    if cached is not None and cached[0] == key and now - cached[1] < _CLINICS_TTL_SECONDS:
+        return list(cached[2])
+
     conn = get_conn()
     rows = conn.execute(
         "SELECT name FROM clinics ORDER BY name COLLATE NOCASE"
     ).fetchall()
-    return [r[0] for r in rows]
+    names = tuple(r[0] for r in rows)
+    _clinics_cache = (key, now, names)
+    return list(names)
 
 
 def add_clinic(name: str) -> None:
@@ -167,8 +362,9 @@ def add_clinic(name: str) -> None:
         conn.execute("INSERT INTO clinics(name) VALUES (?)", (name,))
         conn.execute(
             "INSERT INTO audit_log(action, entity, details) VALUES(?,?,?)",
-            ("clinic_create", "clinic", json.dumps({"name": name}, ensure_ascii=False)),
+            ("clinic_create", "clinic", audit_details({"name": name})),
         )
+    invalidate_clinics_cache()
 
 
 def delete_clinic(name: str) -> None:
@@ -189,21 +385,27 @@ def delete_clinic(name: str) -> None:
         raise ValueError(f"Klinik '{name}' kann nicht geloescht werden, {count} Fall oder Faelle verweisen darauf.")
 
     with conn:
-        # Klinik aus Nutzerrechten entfernen (nur wenn nicht ALL)
-        users = cur.execute("SELECT id, clinics FROM users WHERE clinics != ?", (ALL_CLINICS_SENTINEL,)).fetchall()
+        # Klinik aus Nutzerrechten entfernen (nur wenn nicht ALL).
+        # instr() laesst nur Zeilen durch, die den Namen ueberhaupt enthalten; die Liste selbst
+        # wird in Python zerlegt, damit Leerzeichen und doppelte Eintraege sicher erfasst werden.
+        users = cur.execute(
+            "SELECT id, clinics FROM users WHERE clinics != ? AND instr(clinics, ?) > 0",
+            (ALL_CLINICS_SENTINEL, name),
+        ).fetchall()
+        updates = []
         for uid, clinics_csv in users:
             parts = [c.strip() for c in (clinics_csv or "").split(",") if c.strip()]
             if name in parts:
-                parts = [c for c in parts if c != name]
-                new_csv = ",".join(parts)
-                cur.execute("UPDATE users SET clinics=? WHERE id=?", (new_csv, uid))
+                updates.append((",".join(c for c in parts if c != name), uid))
+        cur.executemany("UPDATE users SET clinics=? WHERE id=?", updates)
 
         # Klinik löschen und Audit schreiben
         cur.execute("DELETE FROM clinics WHERE name=?", (name,))
         cur.execute(
             "INSERT INTO audit_log(action, entity, details) VALUES(?,?,?)",
-            ("clinic_delete", "clinic", json.dumps({"name": name}, ensure_ascii=False)),
+            ("clinic_delete", "clinic", audit_details({"name": name})),
         )
+    invalidate_clinics_cache()
 
 
 # ========= Cases API =========
@@ -263,16 +465,11 @@ def mark_case_done(
         returned_date = date.today().strftime("%Y-%m-%d")
 
     with conn:
-        if closed_by is not None:
-            conn.execute(
-                "UPDATE cases SET status=?, date_returned=?, closed_by=? WHERE id=?",
-                (STATUS_DONE, returned_date, closed_by, case_id),
-            )
-        else:
-            conn.execute(
-                "UPDATE cases SET status=?, date_returned=? WHERE id=?",
-                (STATUS_DONE, returned_date, case_id),
-            )
+        # closed_by=None lässt den bisherigen Wert stehen
+        conn.execute(
+            "UPDATE cases SET status=?, date_returned=?, closed_by=COALESCE(?, closed_by) WHERE id=?",
+            (STATUS_DONE, returned_date, closed_by, case_id),
+        )
 
         conn.execute(
             "INSERT INTO audit_log(action, entity, entity_id, details) VALUES(?,?,?,?)",
@@ -280,10 +477,7 @@ def mark_case_done(
                 "case_update",
                 "case",
                 case_id,
-                json.dumps(
-                    {"status": STATUS_DONE, "date_returned": returned_date, "closed_by": closed_by},
-                    ensure_ascii=False,
-                ),
+                audit_details({"status": STATUS_DONE, "date_returned": returned_date, "closed_by": closed_by}),
             ),
         )
 
@@ -306,7 +500,7 @@ def delete_case(case_id: int) -> None:
                 "case_delete",
                 "case",
                 case_id,
-                json.dumps({"id": case_id, "preview": row}, ensure_ascii=False),
+                audit_details({"id": case_id, "preview": row}),
             ),
         )
 
@@ -323,7 +517,12 @@ def set_user_password(user_id: int, new_plain: str) -> None:
     if len(new_plain) < 8:
         raise ValueError("Das Passwort muss mindestens 8 Zeichen lang sein.")
 
-    hpw = bcrypt.hashpw(new_plain.encode("utf-8"), bcrypt.gensalt())
+    # Import hier, weil auth.py seinerseits db.py importiert.
+    # Gleiche Hash-Erzeugung wie beim Anlegen (BCRYPT_ROUNDS, 72-Byte-Grenze von bcrypt).
+    from app.backend.auth import _hash_password as _auth_hash_password, clear_verify_cache
+    hpw = _auth_hash_password(new_plain)
+    clear_verify_cache()
+
     with get_conn() as c:
         c.execute("UPDATE users SET password_hash=? WHERE id=?", (hpw, user_id))
         c.execute(
@@ -332,45 +531,43 @@ def set_user_password(user_id: int, new_plain: str) -> None:
                 "user_password_reset",
                 "user",
                 user_id,
-                json.dumps({"user_id": user_id}, ensure_ascii=False),
+                audit_details({"user_id": user_id}),
             ),
         )
 # Pruning: Alte Einträge löschen, um DB klein zu halten
 
 def prune_completed_cases(conn: sqlite3.Connection, keep: int = 1000) -> int:
-    cur = conn.cursor()
-    over = cur.execute(
-        "SELECT MAX(COUNT(*), 0) FROM (SELECT 1 FROM cases WHERE status='Abgeschlossen')"
-    ).fetchone()[0] - keep
-    over = max(0, over or 0)
-    if over <= 0:
-        return 0
-    ids = [r[0] for r in cur.execute("""
-        SELECT id FROM cases
-        WHERE status='Abgeschlossen'
-        ORDER BY (date_returned IS NULL) ASC, date_returned ASC, id ASC
-        LIMIT ?
-    """, (over,)).fetchall()]
-    if not ids:
-        return 0
-    q = ",".join("?" * len(ids))
+    """
+    Begrenzt abgeschlossene Fälle auf 'keep' Stück, die ältesten Rückgaben fliegen zuerst.
+    Zählen, Auswählen und Löschen laufen in einem einzigen Statement.
+    """
     with conn:
-        conn.execute(f"DELETE FROM cases WHERE id IN ({q})", ids)
-    return len(ids)
+        cur = conn.execute("""
+            DELETE FROM cases
+            WHERE id IN (
+                SELECT id FROM cases
+                WHERE status='Abgeschlossen'
+                ORDER BY (date_returned IS NULL) ASC, date_returned ASC, id ASC
+                LIMIT max(0, (SELECT COUNT(*) FROM cases WHERE status='Abgeschlossen') - ?)
+            )
+        """, (keep,))
+    return cur.rowcount
+
 
 def prune_audit_log(conn: sqlite3.Connection, keep: int = 5000) -> int:
-    cur = conn.cursor()
-    total = cur.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
-    over = max(0, total - keep)
-    if over <= 0:
+    """
+    Kürzt das Audit-Log auf die neuesten 'keep' Einträge (keep <= 0: alle löschen).
+    Die IDs steigen monoton, daher reicht ein Schnitt über die ID; liegt das Log
+    nicht über 'keep', wird ohne Schreibtransaktion abgebrochen.
+    """
+    if keep <= 0:
+        with conn:
+            cur = conn.execute("DELETE FROM audit_log")
+        return cur.rowcount
+    # neuester Eintrag, der nicht mehr zu den 'keep' neuesten gehört (über den Primärschlüssel)
+    row = conn.execute("SELECT id FROM audit_log ORDER BY id DESC LIMIT 1 OFFSET ?", (keep,)).fetchone()
+    if row is None:
         return 0
     with conn:
-        conn.execute("""
-            DELETE FROM audit_log
-            WHERE id IN (
-                SELECT id FROM audit_log
-                ORDER BY id ASC
-                LIMIT ?
-            )
-        """, (over,))
-    return over
\ No newline at end of file
+        cur = conn.execute("DELETE FROM audit_log WHERE id <= ?", (row[0],))
+    return cur.rowcount
@@ -1,122 +1,290 @@
 from __future__ import annotations
 
 import hashlib
+import itertools
 import json
+import operator
 import os
 import sqlite3
 import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.backend.db.db import audit_details, get_conn
+
+# orjson ist optional: schneller und liefert direkt UTF-8-Bytes, sonst Standardbibliothek.
+# Der Zeilenhash gilt für die geschriebenen Bytes, daher sind beide Varianten lesbar.
+# Die Datei ist nur für die Maschine: kompakte Trenner, ASCII-Escapes (schnellster Encoder).
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ModuleNotFoundError:
+    _ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+    def _dumps(obj) -> bytes:
+        return _ENCODER.encode(obj).encode("ascii")
+
+    _loads = json.loads
 
 
 # ============================================
 # Pfade und Ablage
 # ============================================
 
+# Einmal beim Import auflösen, resolve() kostet Systemaufrufe
+_BUFFER_PATH = Path(__file__).resolve().parent.parent / "db" / "resources" / "buffer_queue.jsonl"
+
+
 def _buffer_path() -> Path:
     """
     Liefert den Speicherort der Pufferdatei.
-    Hinweis: Du kannst den Pfad bei Bedarf zentral hier anpassen,
+    Die Datei ist zeilenweise aufgebaut (JSONL), ein Eintrag pro Zeile.
+    Hinweis: Du kannst den Pfad bei Bedarf zentral über _BUFFER_PATH anpassen,
     zum Beispiel um ihn in einen AppData-Ordner zu verlegen.
     """
-    return Path(__file__).resolve().parent.parent / "." / "db" / "resources" / "buffer_queue.json"
+    return _BUFFER_PATH
+
+
+def _legacy_buffer_path() -> Path:
+    """Früheres Format: eine JSON-Datei mit allen Einträgen und einem Gesamthash."""
+    return _buffer_path().with_suffix(".json")
 
 
 # ============================================
-# Hash-Helfer
+# Hash-Helfer und Zeilenformat
 # ============================================
 
-def _calc_hash(entries: List[Dict]) -> str:
-    """
-    Berechnet einen SHA256-Hash über den Inhalt der Einträge.
-    Der Hash deckt nur die Liste der Einträge ab, nicht die umgebenden Metadaten.
-    """
+# Jede Zeile: {"hash":"<sha256 der Eintrags-Bytes>","entry":{...}}
+# Der Hash steht an fester Position, geprüft werden genau die geschriebenen Bytes.
+_LINE_PREFIX = b'{"hash":"'
+_LINE_MIDDLE = b'","entry":'
+_HASH_LEN = 64
+_ENTRY_START = len(_LINE_PREFIX) + _HASH_LEN + len(_LINE_MIDDLE)
+
+
+# einmal gebunden: OpenSSL-Implementierung, nutzt SHA-Erweiterungen der CPU, falls vorhanden
+_sha256 = hashlib.sha256
+
+
+def _calc_hash(data: bytes) -> str:
+    """Berechnet einen SHA256-Hash über die serialisierten Bytes eines Eintrags."""
+    return _sha256(data).hexdigest()
+
+
+def _calc_legacy_hash(entries: List[Dict]) -> str:
+    """Hash des alten Dateiformats über die ganze Liste (nur noch für die Migration)."""
     payload = json.dumps(entries, sort_keys=True, ensure_ascii=False).encode("utf-8")
-    return hashlib.sha256(payload).hexdigest()
+    return _sha256(payload).hexdigest()
+
+
+def _encode_line(entry: Dict) -> bytes:
+    """Serialisiert einen Eintrag samt Hash als eine Zeile."""
+    data = _dumps(entry)
+    return _LINE_PREFIX + _calc_hash(data).encode("ascii") + _LINE_MIDDLE + data + b"}\n"
+
+
+def _decode_line(line: bytes) -> Optional[Dict]:
+    """Prüft eine Zeile gegen ihren Hash und liefert den Eintrag, bei Beschädigung None."""
+    line = line.rstrip(b"\r\n")
+    if (
+        not line.startswith(_LINE_PREFIX)
+        or line[_ENTRY_START - len(_LINE_MIDDLE):_ENTRY_START] != _LINE_MIDDLE
+        or not line.endswith(b"}")
+    ):
+        return None
+    data = line[_ENTRY_START:-1]
+    if _calc_hash(data).encode("ascii") != line[len(_LINE_PREFIX):len(_LINE_PREFIX) + _HASH_LEN]:
+        return None
+    try:
+        entry = _loads(data)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
 
 
 # ============================================
 # Lesen und Schreiben mit Integritätsprüfung
 # ============================================
 
-def _load_buffer() -> List[Dict]:
+def _iter_buffer_file(p: Path) -> Iterator[Dict]:
     """
-    Lädt den Puffer und prüft den Integritätshash.
-    Wenn die Prüfung fehlschlägt oder die Datei defekt ist, wird eine leere Liste zurückgegeben.
-    Die defekte Datei wird umbenannt, damit sie nicht weiter stört.
+    Liefert die Einträge der Pufferdatei einzeln, während die Datei gelesen wird.
+    Jede Zeile wird gegen ihren Hash geprüft. Beschädigte Zeilen (z. B. abgebrochenes
+    Schreiben) werden übersprungen und danach in eine .corrupt-Datei daneben gelegt,
+    damit nichts stillschweigend verloren geht.
     """
-    p = _buffer_path()
-    if not p.exists():
-        return []
-
+    bad: List[bytes] = []
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
-        entries = data.get("entries", [])
-        expected_hash = data.get("hash")
-        actual_hash = _calc_hash(entries)
+        # kein exists() vorab: fehlt die Datei, scheitert schon open()
+        with open(p, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = _decode_line(line)
+                if entry is None:
+                    bad.append(line if line.endswith(b"\n") else line + b"\n")
+                else:
+                    yield entry
+    except OSError:
+        return
+
+    if bad:
+        _set_aside_bad_lines(p, bad)
+
+
+def _set_aside_bad_lines(p: Path, bad: List[bytes]) -> None:
+    """Sichert beschädigte Zeilen in die .corrupt-Datei und entfernt sie aus dem Puffer."""
+    try:
+        with open(p.with_name(p.name + ".corrupt"), "ab") as f:
+            f.writelines(bad)
+        # erst lesen und schließen, dann ersetzen: unter Windows scheitert os.replace auf eine offene Datei
+        with open(p, "rb") as src:
+            good = [line for line in src if line.strip() and _decode_line(line) is not None]
+        _write_atomic(p, good)
+    except OSError:
+        pass
+
 
-        if expected_hash != actual_hash:
-            # Datei wurde verändert oder unvollständig gespeichert – zur Seite legen
-            try:
-                p.rename(p.with_suffix(".json.corrupt"))
-            except Exception:
-                pass
-            return []
+# Pfade, für die die Migration schon geprüft wurde: spart pro Anhängen einen stat()-Aufruf
+_legacy_checked: Set[Path] = set()
 
-        # Sicherheitsnetz: nur Listen zulassen
-        if not isinstance(entries, list):
-            return []
 
-        return entries
+def _migrate_legacy_buffer() -> None:
+    """Übernimmt einen Puffer im alten JSON-Format einmalig ins Zeilenformat."""
+    old = _legacy_buffer_path()
+    if old in _legacy_checked:
+        return
+    _legacy_checked.add(old)
+    if old == _buffer_path() or not old.exists():
+        return
 
+    try:
+        data = json.loads(old.read_text(encoding="utf-8"))
+        entries = data.get("entries", [])
+        valid = isinstance(entries, list) and data.get("hash") == _calc_legacy_hash(entries)
     except Exception:
-        # Datei unlesbar oder JSON fehlerhaft – zur Seite legen und mit leerem Puffer weitermachen
+        valid = False
+
+    if not valid:
+        # wie bisher: defekte Datei zur Seite legen und ohne sie weitermachen
         try:
-            p.rename(p.with_suffix(".json.bak"))
+            old.rename(old.with_suffix(".json.corrupt"))
         except Exception:
             pass
-        return []
+        return
 
+    # alte Einträge sind älter als alles, was schon im neuen Format steht
+    _save_buffer(entries + list(_iter_buffer_file(_buffer_path())))
+    try:
+        old.unlink()
+    except OSError:
+        pass
 
-def _save_buffer(entries: List[Dict]) -> None:
+
+def _iter_buffer() -> Iterator[Dict]:
+    """Liefert alle gültigen Einträge des Puffers in Reihenfolge, ohne die Datei ganz zu laden."""
+    _migrate_legacy_buffer()
+    yield from _iter_buffer_file(_buffer_path())
+
+
+# Für Dateiinhalte genügt fdatasync (ohne Zeitstempel-Metadaten); wo es fehlt
+# (Windows, macOS), wie bisher fsync. Ordner werden weiterhin per fsync gesichert.
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+def _fsync_dir(d: Path) -> None:
     """
-    Speichert den Puffer atomar mit Integritätshash.
-    Der Schreibvorgang nutzt eine temporäre Datei und ersetzt danach die Zieldatei in einem Schritt.
+    Sichert den Verzeichniseintrag, damit ein os.replace oder eine neu angelegte
+    Datei einen Absturz übersteht. Unter Windows lassen sich Ordner nicht öffnen.
     """
-    p = _buffer_path()
-    p.parent.mkdir(parents=True, exist_ok=True)
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
-    payload = {
-        "entries": entries,
-        "hash": _calc_hash(entries),
-    }
 
-    # Temporäre Datei schreiben, auf Festplatte sichern, dann atomar ersetzen
-    with tempfile.NamedTemporaryFile("w", delete=False, dir=p.parent, encoding="utf-8") as tmp:
-        json.dump(payload, tmp, indent=2, ensure_ascii=False)
-        tmp.flush()
-        os.fsync(tmp.fileno())
+def _write_atomic(p: Path, chunks: Iterable[bytes]) -> None:
+    """
+    Schreibt die Daten in eine temporäre Datei im selben Ordner, sichert sie auf
+    die Festplatte, ersetzt danach die Zieldatei in einem Schritt und sichert
+    zuletzt den Ordner (write, fsync, rename, fsync des Ordners).
+    """
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=p.parent) as tmp:
+        try:
+            tmp.writelines(chunks)
+            tmp.flush()
+            _fdatasync(tmp.fileno())
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
         tmp_name = tmp.name
 
     os.replace(tmp_name, p)
+    _fsync_dir(p.parent)
+
+
+def _save_buffer(entries: List[Dict]) -> None:
+    """Schreibt den Puffer komplett neu, z. B. mit den nach einer Synchronisation verbliebenen Einträgen."""
+    _write_atomic(_buffer_path(), (_encode_line(e) for e in entries))
 
 
 # ============================================
 # Puffer-Operationen
 # ============================================
 
+# Anhängen an die Pufferdatei. Mit O_DSYNC ist jedes write() bereits auf der Platte,
+# ein zusätzliches fsync entfällt. Ganz neu geschrieben wird die Datei nur über
+# _write_atomic (temporäre Datei + os.replace).
+# Anhängen und Abgleich nicht gleichzeitig: sonst überschreibt der Rest eines Abgleichs
+# frisch angehängte Zeilen, oder zwei Abgleiche wenden dieselben Einträge doppelt an.
+_buffer_lock = threading.Lock()
+
+_APPEND_FLAGS = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+_O_DSYNC = getattr(os, "O_DSYNC", 0)
+
 def enqueue_write(payload: Dict) -> None:
     """
     Hängt einen neuen Datensatz an den lokalen Puffer an.
     Beispiel: {"type": "insert_case", ...}
+    Es wird nur die neue Zeile geschrieben, die Datei wird nicht neu aufgebaut.
     """
-    entries = _load_buffer()
-    entries.append(payload)
-    _save_buffer(entries)
+    with _buffer_lock:
+        _migrate_legacy_buffer()
+        p = _buffer_path()
+        p.parent.mkdir(parents=True, exist_ok=True)
+
+        line = _encode_line(payload)
+        fd = os.open(p, _APPEND_FLAGS | _O_DSYNC, 0o644)
+        try:
+            # Brach ein früherer Schreibvorgang mitten in der Zeile ab, in neuer Zeile beginnen
+            is_new = os.lseek(fd, 0, os.SEEK_END) == 0
+            if not is_new:
+                os.lseek(fd, -1, os.SEEK_END)
+                if os.read(fd, 1) != b"\n":
+                    line = b"\n" + line
+            view = memoryview(line)
+            while view:
+                view = view[os.write(fd, view):]
+            if not _O_DSYNC:
+                # ohne O_DSYNC (z. B. Windows) wie bisher explizit sichern
+                _fdatasync(fd)
+        finally:
+            os.close(fd)
+        if is_new:
+            # neu angelegte Datei: auch den Ordnereintrag sichern
+            _fsync_dir(p.parent)
 
 
 # ============================================
-# Anwenden einzelner Puffer-Einträge
+# Anwenden von Puffer-Einträgen
 # ============================================
 
 _INSERT_FIELDS: Tuple[str, ...] = (
@@ -124,102 +292,269 @@ _INSERT_FIELDS: Tuple[str, ...] = (
     "status", "reason", "date_submitted", "date_returned", "notes", "created_by",
 )
 
+# Parameter in einem Schritt aus dem Eintrag holen; fehlt ein Feld, per .get() mit None
+_insert_values = operator.itemgetter(*_INSERT_FIELDS)
+_update_values = operator.itemgetter("status", "date_returned", "closed_by", "id")
+
+_SQL_INSERT_CASE = """
+    INSERT INTO cases(
+        clinic, device_name, wave_number, submitter, service_provider,
+        status, reason, date_submitted, date_returned, notes, created_by
+    ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
+"""
+_SQL_UPDATE_CASE = "UPDATE cases SET status=?, date_returned=?, closed_by=? WHERE id=?"
+_SQL_DELETE_CASE = "DELETE FROM cases WHERE id=?"
+_SQL_AUDIT_DELETE = "INSERT INTO audit_log(action, entity, entity_id, details) VALUES(?,?,?,?)"
+
+
+def _insert_params(entry: Dict) -> tuple:
+    """Parameter für insert_case; Pflichtfelder müssen gesetzt sein."""
+    if not entry.get("clinic"):
+        raise ValueError("Feld 'clinic' fehlt oder ist leer.")
+    if not entry.get("device_name"):
+        raise ValueError("Feld 'device_name' fehlt oder ist leer.")
+    try:
+        return _insert_values(entry)
+    except KeyError:
+        return tuple(entry.get(k) for k in _INSERT_FIELDS)
+
+
+def _update_params(entry: Dict) -> tuple:
+    """Parameter für update_case; die Fall-ID muss gesetzt sein."""
+    cid = entry.get("id")
+    if cid is None:
+        raise ValueError("Feld 'id' fehlt für update_case.")
+    try:
+        return _update_values(entry)
+    except KeyError:
+        return entry.get("status"), entry.get("date_returned"), entry.get("closed_by"), cid
+
+
+def _delete_params(entry: Dict) -> tuple:
+    """Parameter für delete_case; die Fall-ID muss gesetzt sein."""
+    cid = entry.get("id")
+    if cid is None:
+        raise ValueError("Feld 'id' fehlt für delete_case.")
+    return (cid,)
+
+
+def _insert_rows(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    conn.executemany(_SQL_INSERT_CASE, rows)
+
+
+def _update_rows(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    conn.executemany(_SQL_UPDATE_CASE, rows)
+
+
+def _delete_details(cid) -> str:
+    """Audit-Details für delete_case; Ganzzahl-IDs ohne Umweg über Dict und JSON-Encoder."""
+    if type(cid) is int:
+        return '{"id":%d}' % cid      # identisch zu audit_details({"id": cid})
+    return audit_details({"id": cid})
+
+
+def _delete_rows(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    conn.executemany(_SQL_DELETE_CASE, rows)
+    conn.executemany(
+        _SQL_AUDIT_DELETE,
+        (("case_delete", "case", cid, _delete_details(cid)) for (cid,) in rows),
+    )
+
+
+# Puffer-Typ -> (Parameter aus Eintrag, Zeilen schreiben)
+_HANDLERS = {
+    "insert_case": (_insert_params, _insert_rows),
+    "update_case": (_update_params, _update_rows),
+    "delete_case": (_delete_params, _delete_rows),
+}
+
+
+def _entry_params(entry: Dict) -> Tuple[str, tuple]:
+    """
+    Prüft einen Puffer-Eintrag und liefert (Typ, SQL-Parameter).
+    Unterstützte Typen: siehe _HANDLERS (insert_case, update_case, delete_case).
+    Ungültige Einträge lösen ValueError aus.
+    """
+    etype = entry.get("type")
+    handler = _HANDLERS.get(etype) if isinstance(etype, str) else None
+    if handler is None:
+        raise ValueError(f"Unbekannter Puffer-Typ: {etype}")
+    return etype, handler[0](entry)
+
+
+def _apply_rows(conn: sqlite3.Connection, etype: str, rows: List[tuple]) -> None:
+    """Schreibt Parameterzeilen eines Typs mit executemany, Transaktion beim Aufrufer."""
+    _HANDLERS[etype][1](conn, rows)
+
+
 def _apply_buffer_entry(conn: sqlite3.Connection, entry: Dict) -> None:
     """
     Wendet genau einen Puffer-Eintrag auf die Datenbank an.
-    Unterstützte Typen:
-      - insert_case
-      - update_case
-      - delete_case
+    Die Transaktion verwaltet der Aufrufer (siehe sync_buffer_once).
     """
-    etype = entry.get("type")
+    etype, params = _entry_params(entry)
+    _apply_rows(conn, etype, [params])
 
-    if etype == "insert_case":
-        # Pflichtfelder prüfen
-        if not entry.get("clinic"):
-            raise ValueError("Feld 'clinic' fehlt oder ist leer.")
-        if not entry.get("device_name"):
-            raise ValueError("Feld 'device_name' fehlt oder ist leer.")
-
-        values = [entry.get(k) for k in _INSERT_FIELDS]
-        with conn:
-            conn.execute(
-                """
-                INSERT INTO cases(
-                    clinic, device_name, wave_number, submitter, service_provider,
-                    status, reason, date_submitted, date_returned, notes, created_by
-                ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                values,
-            )
-
-    elif etype == "update_case":
-        cid = entry.get("id")
-        if cid is None:
-            raise ValueError("Feld 'id' fehlt für update_case.")
-        with conn:
-            conn.execute(
-                "UPDATE cases SET status=?, date_returned=?, closed_by=? WHERE id=?",
-                (
-                    entry.get("status"),
-                    entry.get("date_returned"),
-                    entry.get("closed_by"),
-                    cid,
-                ),
-            )
-
-    elif etype == "delete_case":
-        cid = entry.get("id")
-        if cid is None:
-            raise ValueError("Feld 'id' fehlt für delete_case.")
-        with conn:
-            conn.execute("DELETE FROM cases WHERE id=?", (cid,))
-            conn.execute(
-                "INSERT INTO audit_log(action, entity, entity_id, details) VALUES(?,?,?,?)",
-                (
-                    "case_delete",
-                    "case",
-                    cid,
-                    json.dumps({"id": cid}, ensure_ascii=False),
-                ),
-            )
-
-    else:
-        raise ValueError(f"Unbekannter Puffer-Typ: {etype}")
+
+def _apply_run(conn: sqlite3.Connection, run: List[Dict], failed: List[Dict]) -> Tuple[int, Optional[List[Dict]]]:
+    """
+    Wendet eine Folge gleichartiger Einträge an, im Normalfall mit einem executemany.
+    Schlägt das fehl, werden die Einträge einzeln nachgefahren, um den fehlerhaften zu finden.
+    Ungültige Einträge landen in 'failed'.
+    Rückgabe: (Anzahl erfolgreich, bei Busy die noch offenen Einträge, sonst None)
+    """
+    valid: List[Dict] = []
+    rows: List[tuple] = []
+    etype = ""
+    for e in run:
+        try:
+            etype, params = _entry_params(e)
+        except ValueError:
+            failed.append(e)
+            continue
+        valid.append(e)
+        rows.append(params)
+    if not rows:
+        return 0, None
+
+    conn.execute("SAVEPOINT buffer_batch")
+    try:
+        _apply_rows(conn, etype, rows)
+        conn.execute("RELEASE buffer_batch")
+        return len(rows), None
+    except Exception as ex:
+        conn.execute("ROLLBACK TO buffer_batch")
+        conn.execute("RELEASE buffer_batch")
+        if _is_busy(ex):
+            return 0, valid
+        if isinstance(ex, sqlite3.OperationalError):
+            # betrifft nicht einzelne Einträge (z. B. Schema, Platte) – ganzen Abgleich abbrechen
+            raise
+
+    ok_count = 0
+    for i, e in enumerate(valid):
+        conn.execute("SAVEPOINT buffer_entry")
+        try:
+            _apply_buffer_entry(conn, e)
+            conn.execute("RELEASE buffer_entry")
+            ok_count += 1
+        except Exception as ex:
+            conn.execute("ROLLBACK TO buffer_entry")
+            conn.execute("RELEASE buffer_entry")
+            if _is_busy(ex):
+                return ok_count, valid[i:]
+            if isinstance(ex, sqlite3.OperationalError):
+                raise
+            failed.append(e)
+    return ok_count, None
 
 
 # ============================================
 # Synchronisation
 # ============================================
 
-def sync_buffer_once(conn: sqlite3.Connection) -> Tuple[int, int]:
+def _tune_conn(conn: sqlite3.Connection) -> None:
+    """
+    Setzt die PRAGMAs, die das Abarbeiten des Puffers braucht.
+    Die Verbindung kann von außen kommen, daher wird nicht auf get_conn() vertraut.
+    """
+    conn.execute("PRAGMA busy_timeout=5000;")      # bei Sperren intern warten statt sofort abbrechen
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+
+
+_BUSY_MESSAGES = ("database is locked", "database table is locked")
+
+
+def _is_busy(ex: Exception) -> bool:
+    """True, wenn SQLite die Datenbank als gesperrt oder beschäftigt meldet."""
+    code = getattr(ex, "sqlite_errorcode", None)
+    if code is None:
+        # ältere Python-Versionen oder selbst erzeugte Fehler ohne Fehlercode
+        return isinstance(ex, sqlite3.OperationalError) and str(ex).startswith(_BUSY_MESSAGES)
+    return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def sync_buffer_once(conn: Optional[sqlite3.Connection] = None) -> Tuple[int, int]:
     """
     Versucht, alle Puffer-Einträge mit der Datenbank zu synchronisieren.
     Rückgabe: (Anzahl erfolgreich, Anzahl verblieben)
 
+    Alle Einträge laufen in einer Transaktion (BEGIN IMMEDIATE). Aufeinanderfolgende
+    Einträge gleichen Typs werden per executemany in einem Savepoint geschrieben,
+    so gibt es nur ein Commit für den ganzen Puffer.
+
     Verhalten bei Problemen:
     - Wenn ein Eintrag wegen Sperren oder Busy nicht verarbeitet werden kann,
       wird ab diesem Punkt abgebrochen und der Rest bleibt im Puffer.
     - Einträge mit anderen Fehlern werden übersprungen und verbleiben ebenfalls.
+    - Andere OperationalErrors (z. B. fehlende Tabelle) rollen alles zurück, der Puffer bleibt unverändert.
+
+    Ohne conn wird die Verbindung des aufrufenden Threads aus get_conn() genutzt,
+    so können auch Hintergrund-Threads abgleichen, ohne neu zu verbinden.
+    Die Verbindung darf keine offene Transaktion haben; sonst wird nichts abgeglichen
+    und alle Einträge zählen als verblieben.
     """
-    entries = _load_buffer()
-    if not entries:
+    with _buffer_lock:
+        return _drain_buffer(conn if conn is not None else get_conn())
+
+
+def _drain_buffer(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Arbeitet den Puffer ab, siehe sync_buffer_once. Der Aufrufer hält _buffer_lock."""
+    entries = _iter_buffer()
+    first = next(entries, None)
+    if first is None:
         return 0, 0
 
+    if conn.in_transaction:
+        # offene Änderungen des Aufrufers weder mitcommitten noch verwerfen: Puffer bleibt, wie er ist
+        return 0, 1 + sum(1 for _ in entries)
+
+    _tune_conn(conn)
+
     ok_count = 0
+    seen = 0
     failed: List[Dict] = []
 
-    for i, e in enumerate(entries):
-        try:
-            _apply_buffer_entry(conn, e)
-            ok_count += 1
-        except Exception as ex:
-            msg = str(ex).lower()
-            if "locked" in msg or "busy" in msg:
+    try:
+        # Schreibsperre gleich zu Beginn holen
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError:
+        # Datenbank nicht beschreibbar – alles bleibt im Puffer
+        return 0, 1 + sum(1 for _ in entries)
+
+    # aufeinanderfolgende Einträge gleichen Typs gemeinsam schreiben, Reihenfolge bleibt erhalten
+    runs = itertools.groupby(itertools.chain((first,), entries), key=lambda e: e.get("type"))
+    try:
+        for _, group in runs:
+            run = list(group)
+            seen += len(run)
+            done, pending = _apply_run(conn, run, failed)
+            ok_count += done
+            if pending is not None:
                 # Datenbank gerade beschäftigt – Rest später erneut versuchen
-                failed.extend(entries[i:])
+                failed.extend(pending)
+                failed.extend(e for _, rest in runs for e in rest)
                 break
-            failed.append(e)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        return 0, seen + sum(1 for _, rest in runs for _ in rest)
+
+    if ok_count == 0:
+        # nichts übernommen, alle Einträge sind noch offen: Datei nicht neu schreiben
+        return 0, len(failed)
+
+    if not failed:
+        # alles übernommen: Datei entfernen statt leer neu zu schreiben; den Ordner sichern,
+        # damit die Einträge nach einem Absturz nicht erneut angewendet werden
+        p = _buffer_path()
+        try:
+            p.unlink()
+            _fsync_dir(p.parent)
+        except FileNotFoundError:
+            pass
+        return ok_count, 0
 
     _save_buffer(failed)
     return ok_count, len(failed)
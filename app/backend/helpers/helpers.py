@@ -1,6 +1,35 @@
-from typing import Optional, List
+import sqlite3
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, List, Tuple
 from app.backend.db.db import list_clinics
 
+# Spalten der Tabelle cases je Verbindung: id(conn) -> (conn, Spalten), siehe case_columns.
+# sqlite3.Connection erlaubt keine schwachen Referenzen; der Eintrag hält die Verbindung selbst,
+# damit ihre id nicht an eine neue Verbindung (ggf. zu einer anderen Datei) weitergegeben wird.
+_CASE_COLUMNS: Dict[int, Tuple[sqlite3.Connection, FrozenSet[str]]] = {}
+
+# Spaltendefinitionen für nachgerüstete Spalten; alle anderen werden als TEXT angelegt
+_CASE_COLUMN_DECLS = {
+    "status": "TEXT DEFAULT 'In Reparatur'",
+    "date_returned": "TEXT",
+    "closed_by": "TEXT",
+}
+
+
+@lru_cache(maxsize=64)
+def parse_clinics_csv(clinics_csv: str) -> Optional[Tuple[str, ...]]:
+    """
+    Zerlegt die kommagetrennte Klinikliste eines Benutzers einmalig.
+    - 'ALL' steht für alle Kliniken (Rückgabe: None).
+    - Ergebnis wird pro Zeichenkette zwischengespeichert, da sich die Werte pro Sitzung nicht ändern.
+    """
+    if clinics_csv == "ALL":
+        return None
+
+    # CSV-Zeichenkette in saubere Liste umwandeln
+    clinics = tuple(c.strip() for c in clinics_csv.split(",") if c.strip())
+    return clinics or None
+
 
 def clinics_of_user(role: str, clinics_csv: str) -> Optional[List[str]]:
     """
@@ -8,12 +37,11 @@ def clinics_of_user(role: str, clinics_csv: str) -> Optional[List[str]]:
     - Admins oder Benutzer mit 'ALL' haben Zugriff auf alle Kliniken (Rückgabe: None).
     - Für alle anderen wird die kommagetrennte Liste aus clinics_csv verarbeitet.
     """
-    if role == "Admin" or clinics_csv == "ALL":
+    if role == "Admin":
         return None
 
-    # CSV-Zeichenkette in saubere Liste umwandeln
-    clinics = [c.strip() for c in clinics_csv.split(",") if c.strip()]
-    return clinics or None
+    clinics = parse_clinics_csv(clinics_csv)
+    return list(clinics) if clinics else None
 
 
 def clinic_choices_for(role: str, clinics_csv: str) -> List[str]:
@@ -28,5 +56,44 @@ def clinic_choices_for(role: str, clinics_csv: str) -> List[str]:
     if allowed is None:
         return all_clinics
 
-    # Andernfalls nur die Schnittmenge
-    return [c for c in all_clinics if c in allowed]
+    # Andernfalls nur die Schnittmenge (Set statt Liste für die Zugehörigkeitsprüfung)
+    allowed_set = frozenset(allowed)
+    return [c for c in all_clinics if c in allowed_set]
+
+
+def case_columns(conn: sqlite3.Connection) -> FrozenSet[str]:
+    """
+    Gibt die Spaltennamen der Tabelle cases zurück.
+    PRAGMA table_info läuft nur einmal pro Verbindung; ensure_case_columns verwirft den Eintrag nach ALTER TABLE.
+    """
+    entry = _CASE_COLUMNS.get(id(conn))
+    if entry is not None and entry[0] is conn:
+        return entry[1]
+    cols = frozenset(row[1] for row in conn.execute("PRAGMA table_info(cases);"))
+    _forget_closed_connections()
+    _CASE_COLUMNS[id(conn)] = (conn, cols)
+    return cols
+
+
+def _forget_closed_connections() -> None:
+    """Entfernt Einträge geschlossener Verbindungen, damit der Cache sie nicht festhält."""
+    for key, (c, _cols) in list(_CASE_COLUMNS.items()):
+        try:
+            c.total_changes  # wirft ProgrammingError, wenn die Verbindung geschlossen ist
+        except sqlite3.ProgrammingError:
+            del _CASE_COLUMNS[key]
+
+
+def ensure_case_columns(conn: sqlite3.Connection, names: Iterable[str]) -> None:
+    """
+    Rüstet fehlende Spalten in cases nach (älteres Schema).
+    Läuft in der Transaktion des Aufrufers; wird sie zurückgerollt, fehlt die Spalte wieder,
+    deshalb wird der Cache nach einem ALTER TABLE verworfen statt ergänzt.
+    """
+    existing = case_columns(conn)
+    missing = [n for n in names if n not in existing]
+    if not missing:
+        return
+    _CASE_COLUMNS.pop(id(conn), None)
+    for n in missing:
+        conn.execute(f"ALTER TABLE cases ADD COLUMN {n} {_CASE_COLUMN_DECLS.get(n, 'TEXT')}")
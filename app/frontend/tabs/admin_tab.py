@@ -1,21 +1,64 @@
 # app/tabs/admin_tab.py
 from __future__ import annotations
 
-from typing import Optional, Callable, Dict, List, Tuple
-import json
+from typing import Optional, Callable, Dict, Iterable, Iterator, List, Tuple
 import sqlite3
-import bcrypt
 import csv
+from itertools import islice
 
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QAbstractTableModel, QModelIndex, QTimer
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QComboBox, QCheckBox,
-    QPushButton, QTableWidget, QTableWidgetItem, QGroupBox, QAbstractItemView, QMessageBox, QFrame,
+    QPushButton, QTableWidget, QTableWidgetItem, QTableView, QGroupBox, QAbstractItemView, QHeaderView, QMessageBox, QFrame,
     QDialog, QDialogButtonBox, QFileDialog
 )
 
-from app.backend.auth import list_users, add_user, delete_user
-from app.backend.db.db import add_clinic  # Kliniken-Insert über die DB-Kapselung
+from app.backend.auth import list_users, add_user, delete_user, hash_password_async
+from app.backend.db.db import add_clinic, audit_details, invalidate_clinics_cache  # Kliniken über die DB-Kapselung
+
+
+# Trigram-Volltextindex (audit_fts) findet erst ab drei Zeichen, kürzere Suchen filtern in Python
+AUDIT_FTS_MIN_CHARS = 3
+# Wartezeit nach dem letzten Tastendruck, bevor die Audit-Suche läuft
+AUDIT_SEARCH_DELAY_MS = 200
+# Audit-Zeilen pro Seite; weitere Seiten über "Mehr laden" (Keyset: id < kleinste geladene id)
+AUDIT_PAGE_SIZE = 500
+_AUDIT_NO_UPPER_ID = (1 << 63) - 1  # größte SQLite-Ganzzahl: "keine Obergrenze"
+# Details in der Tabelle gekürzt; die Abfrage liefert ein Zeichen mehr, daran ist das Kürzen erkennbar
+AUDIT_DETAILS_MAX_CHARS = 200
+
+
+# Audit-SQL als feste Texte: gleiche Strings treffen den Statement-Cache der Verbindung
+# Benutzernamen löst AdminTab._usernames in Python auf, die Abfrage bleibt ein Scan über audit_log
+_SQL_AUDIT_COLUMNS_FULL = """
+    SELECT a.id, a.ts, a.user_id, a.action, a.entity, a.entity_id, a.details
+    FROM audit_log a
+"""
+_SQL_AUDIT_COLUMNS = f"""
+    SELECT a.id, a.ts, a.user_id, a.action, a.entity, a.entity_id, substr(a.details, 1, {AUDIT_DETAILS_MAX_CHARS + 1})
+    FROM audit_log a
+"""
+_SQL_AUDIT_PAGE_WHERE = """
+    WHERE a.id < ?
+    ORDER BY a.id DESC
+"""
+_SQL_AUDIT_PAGE = _SQL_AUDIT_COLUMNS + _SQL_AUDIT_PAGE_WHERE
+_SQL_AUDIT_PAGE_FULL = _SQL_AUDIT_COLUMNS_FULL + _SQL_AUDIT_PAGE_WHERE  # Export und Python-Filter
+_SQL_AUDIT_DETAILS = "SELECT details FROM audit_log WHERE id = ?"
+# ?1 FTS-Phrase, ?2 Suchtext klein, ?3 Obergrenze id (exklusiv), ?4 Seitengröße
+_SQL_AUDIT_SEARCH_WHERE = """
+    WHERE (a.id IN (SELECT rowid FROM audit_fts WHERE audit_fts MATCH ?1)
+           OR a.user_id IN (SELECT id FROM users WHERE instr(LOWER(username), ?2) > 0)
+           {numeric})
+      AND a.id < ?3
+    ORDER BY a.id DESC
+    LIMIT ?4
+"""
+_SQL_AUDIT_SEARCH = _SQL_AUDIT_COLUMNS + _SQL_AUDIT_SEARCH_WHERE.format(numeric="")
+_SQL_AUDIT_SEARCH_NUMERIC = _SQL_AUDIT_COLUMNS + _SQL_AUDIT_SEARCH_WHERE.format(
+    numeric="OR instr(CAST(a.id AS TEXT), ?2) > 0 OR instr(CAST(a.entity_id AS TEXT), ?2) > 0 "
+            "OR instr(CAST(a.user_id AS TEXT), ?2) > 0"
+)
 
 
 # ========= kompakte UI/DB-Helfer =========
@@ -81,6 +124,122 @@ class CollapsibleSection(QWidget):
         self._btn.blockSignals(False)
 
 
+# Ausrichtungen einmal berechnet; data() wird pro sichtbarer Zelle sehr oft abgefragt
+ALIGN_CENTER = Qt.AlignmentFlag.AlignCenter
+ALIGN_LEFT_VCENTER = Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft
+
+
+# ========= Audit-Tabellenmodell =========
+class AuditTableModel(QAbstractTableModel):
+    """
+    Hält die Audit-Zeilen als einfache Tupel. Die Tabelle fragt nur die gerade
+    sichtbaren Zellen über data() ab, statt für jede Zelle ein Item anzulegen.
+    """
+
+    HEADERS = ("ID", "Zeit", "User", "Aktion", "Entity", "Entity-ID", "Details")
+    NUMERIC_COLS = (0, 5)  # id, entity_id: zentriert und numerisch sortiert
+    DETAILS_COL = 6
+    DETAILS_MAX_CHARS = AUDIT_DETAILS_MAX_CHARS  # längere Details gekürzt anzeigen, vollständig im Tooltip
+    COLUMN_WIDTHS = (60, 150, 120, 120, 120, 80, 400)  # feste Startbreiten statt Messen aller Zellen
+
+    def __init__(self, parent: Optional[QWidget] = None,
+                 details_loader: Optional[Callable[[int], Optional[str]]] = None):
+        super().__init__(parent)
+        self._rows: List[tuple] = []
+        # Zeilen aus der DB tragen höchstens DETAILS_MAX_CHARS + 1 Zeichen Details;
+        # den vollständigen Text holt details_loader(id) erst für den Tooltip
+        self._details_loader = details_loader
+        self._full_details: Dict[int, Optional[str]] = {}
+        self._sort_col = 0
+        self._sort_order = Qt.SortOrder.DescendingOrder
+
+    def set_rows(self, rows: List[tuple]) -> None:
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._full_details.clear()
+        self._rows.sort(key=self._sort_key(), reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        self.endResetModel()
+
+    def append_rows(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+        # nach der aktuellen Sortierung einreihen, Auswahl bleibt erhalten
+        self.sort(self._sort_col, self._sort_order)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            val = self._rows[index.row()][index.column()]
+            text = "" if val is None else str(val)
+            if index.column() == self.DETAILS_COL and len(text) > self.DETAILS_MAX_CHARS:
+                return text[:self.DETAILS_MAX_CHARS] + "…"
+            return text
+        if role == Qt.ItemDataRole.ToolTipRole and index.column() == self.DETAILS_COL:
+            row = self._rows[index.row()]
+            val = row[self.DETAILS_COL]
+            if val is None:
+                return None
+            text = str(val)
+            if len(text) == self.DETAILS_MAX_CHARS + 1 and self._details_loader is not None:
+                if row[0] not in self._full_details:
+                    self._full_details[row[0]] = self._details_loader(row[0])
+                return self._full_details[row[0]] or text
+            return text
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return ALIGN_CENTER if index.column() in self.NUMERIC_COLS else ALIGN_LEFT_VCENTER
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        self._sort_col, self._sort_order = column, order
+        self.layoutAboutToBeChanged.emit()
+
+        key = self._sort_key()
+        rows = self._rows
+        new_order = sorted(range(len(rows)), key=lambda i: key(rows[i]),
+                           reverse=order == Qt.SortOrder.DescendingOrder)
+        self._rows = [rows[i] for i in new_order]
+
+        # Auswahl und aktuelle Zelle wandern mit ihrer Zeile mit
+        new_pos = [0] * len(new_order)
+        for new_row, old_row in enumerate(new_order):
+            new_pos[old_row] = new_row
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(
+            old_indexes,
+            [self.index(new_pos[i.row()], i.column()) for i in old_indexes],
+        )
+        self.layoutChanged.emit()
+
+    def _sort_key(self) -> Callable[[tuple], object]:
+        col = self._sort_col
+        if col in self.NUMERIC_COLS:
+            def key(r: tuple):
+                try:
+                    return int(r[col] or 0)
+                except (TypeError, ValueError):
+                    return 0
+        else:
+            def key(r: tuple):
+                return "" if r[col] is None else str(r[col])
+        return key
+
+
 # ========= AdminTab =========
 class AdminTab(QWidget):
     """
@@ -93,16 +252,21 @@ class AdminTab(QWidget):
     - Schutz: kein Löschen des eigenen Kontos, keine Selbst-Degradierung
     """
 
+    # fertiger bcrypt-Hash aus dem Worker (Future), wird im Hauptthread verarbeitet
+    pw_hash_ready = pyqtSignal(object)
+
     def __init__(self, conn: sqlite3.Connection, current_user_id: int, on_clinics_changed: Optional[Callable] = None):
         super().__init__()
         self.conn = conn
         self.current_user_id = current_user_id
         self.on_clinics_changed = on_clinics_changed
 
-        try:
-            self.conn.execute("PRAGMA foreign_keys = ON;")
-        except Exception:
-            pass
+        # Passwort-Reset: bcrypt läuft im Worker, Speichern danach im Hauptthread
+        self._pw_reset_pending: Optional[Tuple[int, str]] = None
+        self.pw_hash_ready.connect(self._apply_pw_reset)
+
+        # (Primärschlüsselspalte, hat is_system) der Tabelle clinics, siehe _clinics_schema
+        self._clinics_schema_cache: Optional[Tuple[str, bool]] = None
 
         # 1) Benutzerübersicht
         self.gb_list = QGroupBox("Benutzerübersicht")
@@ -194,20 +358,35 @@ class AdminTab(QWidget):
         self.sec_clin = CollapsibleSection("Kliniken verwalten", w_clin, True)
 
         # 5) Audit-Log (Tabelle, Suche, Export)
+        self._audit_fts = self._has_audit_fts()
         self.audit_search = QLineEdit(placeholderText="Im Audit-Log suchen …")
         self.audit_search.setClearButtonEnabled(True)
-        self.audit_search.textChanged.connect(self.refresh_audit)
-
-        self.audit_table = QTableWidget(0, 7)
-        self.audit_table.setHorizontalHeaderLabels(["ID", "Zeit", "User", "Aktion", "Entity", "Entity-ID", "Details"])
+        # erst suchen, wenn kurz nicht mehr getippt wird, statt bei jedem Zeichen
+        self._audit_debounce = QTimer(self)
+        self._audit_debounce.setSingleShot(True)
+        self._audit_debounce.setInterval(AUDIT_SEARCH_DELAY_MS)
+        self._audit_debounce.timeout.connect(self.refresh_audit)
+        self.audit_search.textChanged.connect(lambda _text: self._audit_debounce.start())
+
+        self.audit_model = AuditTableModel(self, details_loader=self._audit_details)
+        self.audit_table = QTableView()
+        self.audit_table.setModel(self.audit_model)
         self.audit_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.audit_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.audit_table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.DescendingOrder)
         self.audit_table.setSortingEnabled(True)
-        self.audit_table.sortItems(0, Qt.SortOrder.DescendingOrder)
+        hdr_audit = self.audit_table.horizontalHeader()
+        hdr_audit.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        for col, width in enumerate(AuditTableModel.COLUMN_WIDTHS):
+            hdr_audit.resizeSection(col, width)
         self.audit_table.verticalHeader().setDefaultSectionSize(28)
         self.audit_table.setAlternatingRowColors(True)
         self.audit_table.setShowGrid(False)
 
+        self.btn_audit_more = QPushButton("Mehr laden")
+        self.btn_audit_more.clicked.connect(self._on_audit_more)
+        self._audit_min_id: Optional[int] = None  # kleinste geladene id, Start der nächsten Seite
+
         self.btn_export_audit = QPushButton("Audit-Log als CSV exportieren …")
         self.btn_export_audit.clicked.connect(self.on_export_audit_log)
 
@@ -215,7 +394,11 @@ class AdminTab(QWidget):
         lay_audit = QVBoxLayout(w_audit)
         lay_audit.addWidget(self.audit_search)
         lay_audit.addWidget(self.audit_table)
-        lay_audit.addWidget(self.btn_export_audit)
+        row_audit = QHBoxLayout()
+        row_audit.addWidget(self.btn_audit_more)
+        row_audit.addStretch(1)
+        row_audit.addWidget(self.btn_export_audit)
+        lay_audit.addLayout(row_audit)
         self.sec_audit = CollapsibleSection("Audit-Log", w_audit, True)
 
         # stets exklusiv öffnen (immer nur eine Sektion offen)
@@ -231,11 +414,14 @@ class AdminTab(QWidget):
         main.addWidget(self.sec_audit)
         main.addStretch(1)
 
-        # initial
+        # initial: nur die immer sichtbare Benutzerübersicht; die eingeklappten Sektionen
+        # laden ihre Daten beim ersten Aufklappen (siehe _load_section)
+        self._clinic_checkboxes_loaded = False
+        self._clinic_select_loaded = False
+        self._audit_loaded = False
+        self._usernames: Dict[int, str] = {}  # user_id -> Benutzername, mit jeder Benutzerliste neu
         self.refresh_users()
-        self._rebuild_clinic_checkboxes()
-        self._reload_clinic_select()
-        self.refresh_audit()
+        self.table.resizeColumnsToContents()  # einmalig; danach behält die Tabelle die Breiten des Benutzers
 
     # ========= interne Helfer =========
     def _exclusive_open(self, sender: CollapsibleSection, checked: bool) -> None:
@@ -244,6 +430,17 @@ class AdminTab(QWidget):
         for sec in (self.sec_add, self.sec_edit, self.sec_clin, self.sec_audit):
             if sec is not sender:
                 sec.set_expanded(False)
+        self._load_section(sender)
+
+    def _load_section(self, sec: CollapsibleSection) -> None:
+        # Daten einer Sektion erst beim ersten Aufklappen holen
+        if sec in (self.sec_add, self.sec_edit) and not self._clinic_checkboxes_loaded:
+            self._rebuild_clinic_checkboxes()
+            self._load_selected_into_form()  # Haken der Auswahl auf die neuen Checkboxen übertragen
+        elif sec is self.sec_clin and not self._clinic_select_loaded:
+            self._reload_clinic_select()
+        elif sec is self.sec_audit and not self._audit_loaded:
+            self.refresh_audit()
 
     def _toggle_all(self, chk_map: Dict[str, QCheckBox], checked: bool) -> None:
         for cb in chk_map.values():
@@ -251,12 +448,15 @@ class AdminTab(QWidget):
             cb.setEnabled(not checked)
 
     def _clinics_schema(self) -> Tuple[str, bool]:
-        cur = self.conn.cursor()
-        cur.execute("PRAGMA table_info(clinics);")
-        cols = {row[1] for row in cur.fetchall()}
-        pk_col = "id" if "id" in cols else "rowid"
-        has_is_system = "is_system" in cols
-        return pk_col, has_is_system
+        # Schema ändert sich während der Sitzung nicht: PRAGMA nur beim ersten Aufruf
+        if self._clinics_schema_cache is None:
+            cur = self.conn.cursor()
+            cur.execute("PRAGMA table_info(clinics);")
+            cols = {row[1] for row in cur.fetchall()}
+            pk_col = "id" if "id" in cols else "rowid"
+            has_is_system = "is_system" in cols
+            self._clinics_schema_cache = (pk_col, has_is_system)
+        return self._clinics_schema_cache
 
     def _fetch_clinics(self) -> List[tuple]:
         pk, has_sys = self._clinics_schema()
@@ -267,35 +467,69 @@ class AdminTab(QWidget):
         return rows or []
 
     def _rebuild_checkbox_row(self, layout: QHBoxLayout, chk_map: Dict[str, QCheckBox], names: List[str]) -> None:
-        while layout.count():
-            item = layout.takeAt(0)
-            w = item.widget()
-            if w:
-                w.setParent(None)
-        chk_map.clear()
-        for n in names:
-            cb = QCheckBox(n)
-            layout.addWidget(cb)
-            chk_map[n] = cb
-        layout.addStretch(1)
-
-    def _rebuild_clinic_checkboxes(self) -> None:
-        names = [name for (_cid, name, _sys) in self._fetch_clinics()]
+        # vorhandene Checkboxen behalten, nur entfernte löschen und neue an ihrer Position einfügen
+        wanted = set(names)
+        for n in [n for n in chk_map if n not in wanted]:
+            cb = chk_map.pop(n)
+            layout.removeWidget(cb)
+            cb.deleteLater()
+        if layout.count() == len(chk_map):
+            layout.addStretch(1)  # erster Aufbau: Stretch bleibt immer am Ende
+        for i, n in enumerate(names):
+            cb = chk_map.get(n)
+            if cb is None:
+                cb = chk_map[n] = QCheckBox(n)
+            elif layout.indexOf(cb) == i:
+                continue
+            else:
+                layout.removeWidget(cb)
+            layout.insertWidget(i, cb)
+
+    def _rebuild_clinic_checkboxes(self, rows: Optional[List[tuple]] = None) -> None:
+        if rows is None:
+            rows = self._fetch_clinics()
+        names = [name for (_cid, name, _sys) in rows]
         self._rebuild_checkbox_row(self.clinic_layout_add, self.chk_add, names)
         self._rebuild_checkbox_row(self.clinic_layout_edit, self.chk_edit, names)
-
-    def _reload_clinic_select(self) -> None:
+        # neue Checkboxen an den Zustand von "Alle Kliniken" angleichen
+        self._toggle_all(self.chk_add, self.chk_all_add.isChecked())
+        self._toggle_all(self.chk_edit, self.chk_all_edit.isChecked())
+        self._clinic_checkboxes_loaded = True
+
+    def _reload_clinic_select(self, rows: Optional[List[tuple]] = None) -> None:
+        if rows is None:
+            rows = self._fetch_clinics()
         self.clinic_delete_select.clear()
-        for cid, name, is_system in self._fetch_clinics():
+        for cid, name, is_system in rows:
             self.clinic_delete_select.addItem(f"{name} {'(🔒)' if is_system else ''}", cid)
+        self._clinic_select_loaded = True
+
+    def _reload_clinics(self) -> None:
+        # eine Abfrage für Checkboxen und Auswahlliste
+        rows = self._fetch_clinics()
+        self._rebuild_clinic_checkboxes(rows)
+        self._reload_clinic_select(rows)
 
     def refresh_users(self) -> None:
         rows = list_users()
-        self.table.setRowCount(len(rows))
-        for r, (id_, uname, role, clinics) in enumerate(rows):
-            for c, val in enumerate((id_, uname, role, clinics)):
-                self.table.setItem(r, c, QTableWidgetItem("" if val is None else str(val)))
-        self.table.resizeColumnsToContents()
+        self._usernames = {id_: uname for (id_, uname, _role, _clinics) in rows}
+        t = self.table
+        # Beim Befüllen nicht nach jedem setItem neu sortieren, zeichnen oder Signale senden
+        sorting = t.isSortingEnabled()
+        t.setUpdatesEnabled(False)
+        t.blockSignals(True)
+        t.setSortingEnabled(False)
+        try:
+            t.setRowCount(len(rows))
+            for r, (id_, uname, role, clinics) in enumerate(rows):
+                for c, val in enumerate((id_, uname, role, clinics)):
+                    t.setItem(r, c, QTableWidgetItem("" if val is None else str(val)))
+        finally:
+            t.setSortingEnabled(sorting)  # einmal nach der aktuellen Spalte sortieren
+            t.blockSignals(False)
+            t.setUpdatesEnabled(True)
+        # Auswahlsignale waren blockiert: Formular einmal zur aktuellen Zeile passend laden
+        self._load_selected_into_form()
 
     def _selected_user_id(self) -> Optional[int]:
         row = self.table.currentRow()
@@ -388,7 +622,7 @@ class AdminTab(QWidget):
                 self.conn.execute("UPDATE users SET role=?, clinics=? WHERE id=?", (new_role, new_clinics, uid))
                 self.conn.execute(
                     "INSERT INTO audit_log(action, entity, entity_id, details) VALUES(?,?,?,?)",
-                    ("user_update", "user", uid, json.dumps({"role": new_role, "clinics": new_clinics}, ensure_ascii=False)),
+                    ("user_update", "user", uid, audit_details({"role": new_role, "clinics": new_clinics})),
                 )
         except Exception as e:
             return msg_warn(self, "Fehler", "Speichern fehlgeschlagen:\n" + str(e))
@@ -448,13 +682,32 @@ class AdminTab(QWidget):
         if not msg_yes(self, "Bestätigen", f"Passwort für Benutzer „{uname}“ wirklich zurücksetzen?"):
             return
 
-        hashed = bcrypt.hashpw(pw1.encode("utf-8"), bcrypt.gensalt())
+        # Hashen dauert spürbar, daher im Worker; die Oberfläche bleibt bedienbar
+        self._pw_reset_pending = (uid, uname)
+        self.btn_reset_pw.setEnabled(False)
+        hash_password_async(pw1).add_done_callback(self._forward_pw_hash)
+
+    def _forward_pw_hash(self, future) -> None:
+        """Läuft im Worker-Thread; das Signal stellt das Ergebnis in die Qt-Ereignisschleife."""
+        try:
+            self.pw_hash_ready.emit(future)
+        except RuntimeError:
+            pass  # Tab wurde inzwischen geschlossen
+
+    def _apply_pw_reset(self, future) -> None:
+        self.btn_reset_pw.setEnabled(True)
+        pending, self._pw_reset_pending = self._pw_reset_pending, None
+        if pending is None:
+            return
+        uid, uname = pending
+
         try:
+            hashed = future.result()
             with self.conn:
                 self.conn.execute("UPDATE users SET password_hash=? WHERE id=?", (hashed, uid))
                 self.conn.execute(
                     "INSERT INTO audit_log(action, entity, entity_id, details) VALUES(?,?,?,?)",
-                    ("user_password_reset", "user", uid, json.dumps({"username": uname}, ensure_ascii=False)),
+                    ("user_password_reset", "user", uid, audit_details({"username": uname})),
                 )
         except Exception as e:
             return msg_warn(self, "Fehler", "Passwort konnte nicht gesetzt werden:\n" + str(e))
@@ -463,8 +716,9 @@ class AdminTab(QWidget):
 
     # ========= Kliniken =========
     def _after_clinic_change(self) -> None:
-        self._rebuild_clinic_checkboxes()
-        self._reload_clinic_select()
+        # Löschen läuft hier direkt per SQL, daher den Klinik-Cache selbst verwerfen
+        invalidate_clinics_cache()
+        self._reload_clinics()
         if self.on_clinics_changed:
             self.on_clinics_changed()
 
@@ -519,69 +773,88 @@ class AdminTab(QWidget):
         msg_info(self, "Klinik", f"Klinik „{name}“ wurde gelöscht.")
 
     # ========= Audit-Log =========
-    def _fetch_audit(self) -> List[tuple]:
-        # Benutzername per LEFT JOIN, Rückfall auf user_id wenn leer
-        cur = self.conn.cursor()
+    def _has_audit_fts(self) -> bool:
+        # Volltextindex wird von db._init_db angelegt; fehlt er (z. B. ohne FTS5), wird in Python gefiltert
         try:
-            cur.execute(
-                """
-                SELECT a.id, a.ts, COALESCE(u.username, CAST(a.user_id AS TEXT)) AS username,
-                       a.action, a.entity, a.entity_id, a.details
-                FROM audit_log a
-                LEFT JOIN users u ON u.id = a.user_id
-                ORDER BY a.id DESC
-                """
-            )
-            return cur.fetchall()
+            return self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='audit_fts'"
+            ).fetchone() is not None
         except Exception:
-            cur.execute(
-                """
-                SELECT id, ts, COALESCE(CAST(user_id AS TEXT), ''), action, entity, entity_id, details
-                FROM audit_log
-                ORDER BY id DESC
-                """
-            )
-            return cur.fetchall()
+            return False
+
+    def _with_usernames(self, rows: Iterable[tuple]) -> Iterator[tuple]:
+        # user_id -> Benutzername aus der Benutzerliste, Rückfall auf die user_id (z. B. gelöschte Benutzer)
+        names = self._usernames
+        for id_, ts, uid, action, entity, entity_id, details in rows:
+            uname = names.get(uid) or ("" if uid is None else str(uid))
+            yield id_, ts, uname, action, entity, entity_id, details
+
+    def _audit_cursor(self, before_id: int = _AUDIT_NO_UPPER_ID, full: bool = False) -> Iterator[tuple]:
+        # neueste zuerst ab before_id, Benutzernamen bereits aufgelöst; Details gekürzt außer bei full
+        sql = _SQL_AUDIT_PAGE_FULL if full else _SQL_AUDIT_PAGE
+        return self._with_usernames(self.conn.execute(sql, (before_id,)))
+
+    def _audit_details(self, audit_id: int) -> Optional[str]:
+        row = self.conn.execute(_SQL_AUDIT_DETAILS, (audit_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def _search_audit_fts(self, q: str, before_id: int) -> List[tuple]:
+        # Textspalten über den Trigram-Index, Benutzername über users, Zahlen nur bei Ziffern-Eingabe
+        sql = _SQL_AUDIT_SEARCH_NUMERIC if q.isdigit() else _SQL_AUDIT_SEARCH
+        return list(self._with_usernames(self.conn.execute(
+            sql, ('"' + q.replace('"', '""') + '"', q, before_id, AUDIT_PAGE_SIZE)
+        )))
+
+    def _fetch_audit_page(self, q: str, before_id: int = _AUDIT_NO_UPPER_ID) -> List[tuple]:
+        """Höchstens AUDIT_PAGE_SIZE passende Zeilen mit id < before_id, neueste zuerst."""
+        if len(q) >= AUDIT_FTS_MIN_CHARS and self._audit_fts:
+            return self._search_audit_fts(q, before_id)
+
+        if not q:
+            # Cursor wird nur so weit gelesen, bis die Seite voll ist
+            return list(islice(self._audit_cursor(before_id), AUDIT_PAGE_SIZE))
+
+        # Filter über die vollständigen Details, erst die Treffer der Seite werden gekürzt;
+        # pro Zeile einmal kleinschreiben statt je Spalte; \x1f trennt, damit kein Treffer über Spaltengrenzen geht
+        rows = (r for r in self._audit_cursor(before_id, full=True)
+                if q in "\x1f".join(["" if x is None else str(x) for x in r]).lower())
+        cut = AUDIT_DETAILS_MAX_CHARS + 1
+        return [r[:6] + (r[6][:cut] if isinstance(r[6], str) else r[6],)
+                for r in islice(rows, AUDIT_PAGE_SIZE)]
+
+    def _show_audit_page(self, rows: List[tuple], append: bool) -> None:
+        if append:
+            self.audit_model.append_rows(rows)
+        else:
+            self.audit_model.set_rows(rows)
+        if rows:
+            self._audit_min_id = rows[-1][0]
+        elif not append:
+            self._audit_min_id = None
+        self.btn_audit_more.setEnabled(len(rows) == AUDIT_PAGE_SIZE)
 
     def refresh_audit(self) -> None:
-        rows = self._fetch_audit()
+        self._audit_debounce.stop()  # direkter Aufruf ersetzt eine noch ausstehende Suche
+        self._audit_loaded = True
         q = self.audit_search.text().strip().lower()
-        if q:
-            def hit(r: tuple) -> bool:
-                return any((str(x or "").lower().find(q) >= 0) for x in r)
-            rows = [r for r in rows if hit(r)]
-
-        self.audit_table.setSortingEnabled(False)
-        self.audit_table.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                text = "" if val is None else str(val)
-                item = QTableWidgetItem(text)
-                if c in (0, 5):  # id, entity_id
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    try:
-                        item.setData(Qt.ItemDataRole.UserRole, int(text or "0"))
-                    except ValueError:
-                        item.setData(Qt.ItemDataRole.UserRole, 0)
-                else:
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft)
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.audit_table.setItem(r, c, item)
-
-        self.audit_table.resizeColumnsToContents()
-        self.audit_table.setSortingEnabled(True)
-        self.audit_table.sortItems(0, Qt.SortOrder.DescendingOrder)
+        self._show_audit_page(self._fetch_audit_page(q), append=False)
+
+    def _on_audit_more(self) -> None:
+        if self._audit_min_id is None:
+            return
+        q = self.audit_search.text().strip().lower()
+        self._show_audit_page(self._fetch_audit_page(q, self._audit_min_id), append=True)
 
     def on_export_audit_log(self) -> None:
         path, _ = QFileDialog.getSaveFileName(self, "Audit-Log als CSV speichern", "audit_log.csv", "CSV (*.csv)")
         if not path:
             return
         try:
-            rows = self._fetch_audit()
-            with open(path, "w", newline="", encoding="utf-8") as f:
+            # Zeilen direkt aus dem Cursor schreiben, ohne das ganze Log vorher zu laden
+            with open(path, "w", newline="", encoding="utf-8", buffering=1 << 16) as f:
                 w = csv.writer(f, delimiter=";")
                 w.writerow(["id", "ts", "user", "action", "entity", "entity_id", "details"])
-                w.writerows(rows)
+                w.writerows(self._audit_cursor(full=True))
         except Exception as e:
             return msg_warn(self, "Fehler", "Audit-Log konnte nicht exportiert werden:\n" + str(e))
         msg_info(self, "Export", f"Audit-Log wurde exportiert nach:\n{path}")
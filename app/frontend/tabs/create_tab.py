@@ -1,5 +1,4 @@
 # app/tabs/create_tab.py
-import json
 import sqlite3
 from typing import Optional
 
@@ -9,11 +8,21 @@ from PyQt6.QtWidgets import (
     QVBoxLayout, QFormLayout, QMessageBox
 )
 
-from app.backend.helpers.helpers import clinic_choices_for
+from app.backend.db.db import audit_details
+from app.backend.helpers.helpers import clinic_choices_for, ensure_case_columns
 from app.backend.helpers.buffer import enqueue_write
 
 MAX_INPUT_CHARS = 30  # harte Obergrenze für alle Einzelfelder; Notizen separat begrenzt
 
+# Feste SQL-Texte: bei jedem Speichern derselbe String, also ein Treffer im Statement-Cache der Verbindung
+_SQL_INSERT_CASE = """
+    INSERT INTO cases(
+        clinic, device_name, wave_number, submitter, service_provider,
+        status, reason, date_submitted, date_returned, notes, created_by, closed_by
+    ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+_SQL_INSERT_AUDIT = "INSERT INTO audit_log(user_id, action, entity, entity_id, details) VALUES(?,?,?,?,?)"
+
 
 class CreateTab(QWidget):
     case_created = pyqtSignal()
@@ -122,15 +131,9 @@ class CreateTab(QWidget):
 
     # ----------------- Persistenz -----------------
     def _ensure_columns(self):
-        """Rüstet optionale Spalten nach, falls älteres Schema."""
-        cur = self.conn.cursor()
-        cur.execute("PRAGMA table_info(cases);")
-        existing = {row[1] for row in cur.fetchall()}
+        """Rüstet optionale Spalten nach, falls älteres Schema (Spalten je Verbindung gecacht)."""
         with self.conn:
-            if "created_by" not in existing:
-                self.conn.execute("ALTER TABLE cases ADD COLUMN created_by TEXT")
-            if "closed_by" not in existing:
-                self.conn.execute("ALTER TABLE cases ADD COLUMN closed_by TEXT")
+            ensure_case_columns(self.conn, ("created_by", "closed_by"))
 
     # ----------------- Aktionen -----------------
     def on_save(self):
@@ -183,14 +186,10 @@ class CreateTab(QWidget):
 
         try:
             self._ensure_columns()
+            # Verbindung läuft mit WAL + synchronous=NORMAL (db._connect): Commit ohne eigenes fsync
             with self.conn:
                 cur = self.conn.execute(
-                    """
-                    INSERT INTO cases(
-                        clinic, device_name, wave_number, submitter, service_provider,
-                        status, reason, date_submitted, date_returned, notes, created_by, closed_by
-                    ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
+                    _SQL_INSERT_CASE,
                     (
                         payload["clinic"], payload["device_name"], payload["wave_number"], payload["submitter"],
                         payload["service_provider"], payload["status"], payload["reason"],
@@ -202,13 +201,13 @@ class CreateTab(QWidget):
 
                 # Audit mit user_id
                 self.conn.execute(
-                    "INSERT INTO audit_log(user_id, action, entity, entity_id, details) VALUES(?,?,?,?,?)",
+                    _SQL_INSERT_AUDIT,
                     (
                         self.current_user_id,
                         "case_create",
                         "case",
                         case_id,
-                        json.dumps(payload, ensure_ascii=False),
+                        audit_details(payload),
                     )
                 )
 
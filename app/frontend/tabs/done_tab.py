@@ -13,9 +13,32 @@ from PyQt6.QtWidgets import (
     QPushButton, QStyle, QHeaderView, QFileDialog, QSizePolicy
 )
 
-from app.backend.helpers.helpers import clinics_of_user
+from app.backend.helpers.helpers import case_columns, clinics_of_user, ensure_case_columns
 from app.backend.helpers.buffer import enqueue_write
 
+# Wartezeit nach dem letzten Tastendruck, bevor die Suche läuft
+SEARCH_DELAY_MS = 150
+
+_EPOCH = datetime(1970, 1, 1)
+_NO_DATE_KEY = -10**9  # Sortierschlüssel für fehlende oder ungültige Daten
+
+
+def _parse_iso(s: Optional[str]) -> Optional[datetime]:
+    # leere Werte ohne Exception aussortieren, alles andere entscheidet fromisoformat
+    if not isinstance(s, str):
+        return None
+    s = s.strip()
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return None
+
+
+def _date_sort_key(d: Optional[datetime]) -> int:
+    return (d - _EPOCH).days if d is not None else _NO_DATE_KEY
+
 
 class DoneTab(QWidget):
     """Abgeschlossene Fälle anzeigen, optional wieder öffnen oder löschen."""
@@ -42,17 +65,26 @@ class DoneTab(QWidget):
         super().__init__()
         self.conn = conn
         self.allowed = clinics_of_user(role, clinics_csv)
+        # WHERE-Klausel und Parameter für den Sichtbereich ändern sich pro Tab nicht
+        self._scope_clause, self._scope_params = self._scope_filter_sql()
         self.read_only = (role == "Viewer")
         self.is_admin = (role == "Admin")
         self.current_user_id = current_user_id
 
         # Optionale Spalten ermitteln
         self._created_by_expr, self._closed_by_expr, self._notes_expr = self._detect_column_exprs()
+        # SQL hängt nur von Schema und Sichtbereich ab: einmal bauen (gleicher Text trifft den Statement-Cache)
+        self._fetch_sql, self._fetch_sql_search = self._build_fetch_sql()
 
         # Suche + Export rechts
         self.search = QLineEdit(placeholderText="Suchen …")
         self.search.setClearButtonEnabled(True)
-        self.search.textChanged.connect(self.refresh)
+        # erst suchen, wenn kurz nicht mehr getippt wird, statt bei jedem Zeichen
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self.refresh)
+        self.search.textChanged.connect(lambda _text: self._search_timer.start())
         self.search.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
         self.btn_export = QPushButton("Exportieren")
@@ -91,6 +123,7 @@ class DoneTab(QWidget):
         # Wenn sich die Sortierung ändert, Breite neu berechnen (Sortpfeil!)
         hdr.sortIndicatorChanged.connect(lambda *_: self._lock_first_header_width())
 
+        self._trash_icon = self.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon)
         # Spalte "Löschen" nur für Admins sichtbar
         if not self.is_admin:
             self.table.setColumnHidden(self.COL_DELETE, True)
@@ -107,11 +140,9 @@ class DoneTab(QWidget):
     # ---------- Schema ----------
     def _detect_column_exprs(self) -> tuple[str, str, str]:
         try:
-            cur = self.conn.cursor()
-            cur.execute("PRAGMA table_info(cases);")
-            cols = {row[1] for row in cur.fetchall()}
+            cols = case_columns(self.conn)
         except Exception:
-            cols = set()
+            cols = frozenset()
         created_expr = "created_by" if "created_by" in cols else "''"
         closed_expr  = "closed_by"  if "closed_by"  in cols else "''"
         notes_expr   = "notes"      if "notes"      in cols else "''"
@@ -124,20 +155,34 @@ class DoneTab(QWidget):
         qmarks = ",".join("?" * len(self.allowed))
         return f"WHERE status='Abgeschlossen' AND clinic IN ({qmarks})", tuple(self.allowed)
 
-    def _fetch(self) -> List[Tuple]:
-        where_sql, params = self._scope_filter_sql()
-        cur = self.conn.cursor()
-        rows = cur.execute(
-            f"""SELECT id, clinic, device_name, wave_number, submitter, service_provider,
+    def _build_fetch_sql(self) -> tuple[str, str]:
+        """SELECT für die Tabelle, einmal ohne und einmal mit Suchbedingung (letzter Parameter: Suchtext)."""
+        where_sql = self._scope_clause
+        select = f"""SELECT id, clinic, device_name, wave_number, submitter, service_provider,
                         reason, date_submitted, date_returned,
                         {self._created_by_expr} AS created_by,
                         {self._closed_by_expr}  AS closed_by,
                         {self._notes_expr}      AS notes
-                 FROM cases {where_sql}
-                 ORDER BY id DESC""",
-            params
-        ).fetchall()
-        return rows
+                 FROM cases {where_sql}"""
+        order = "\n                 ORDER BY id DESC"
+        search = f"\n                   AND instr(LOWER({self._search_text_sql()}), ?) > 0"
+        return select + order, select + search + order
+
+    def _fetch(self, q: str = "") -> List[Tuple]:
+        """
+        Erledigte Fälle im Sichtbereich, optional gefiltert nach q (bereits kleingeschrieben).
+        SQLite schreibt nur ASCII klein: Suchtexte mit Umlauten etc. filtert refresh() in Python.
+        """
+        params = self._scope_params
+        if q and q.isascii():
+            return self.conn.execute(self._fetch_sql_search, params + (q,)).fetchall()
+        return self.conn.execute(self._fetch_sql, params).fetchall()
+
+    def _search_text_sql(self) -> str:
+        # durchsuchte Spalten als ein Text; char(31) trennt, damit kein Treffer über Spaltengrenzen geht
+        cols = ("clinic", "device_name", "wave_number", "submitter", "service_provider", "reason",
+                "date_submitted", "date_returned", self._created_by_expr, self._closed_by_expr, self._notes_expr)
+        return " || char(31) || ".join(f"COALESCE({c}, '')" for c in cols)
 
     # ---------- UI ----------
     def _centered_widget(self, w) -> QWidget:
@@ -149,9 +194,10 @@ class DoneTab(QWidget):
         return wrapper
 
     def refresh(self):
-        rows = self._fetch()
+        self._search_timer.stop()  # direkter Aufruf ersetzt eine noch ausstehende Suche
         q = self.search.text().strip().lower()
-        if q:
+        rows = self._fetch(q)
+        if q and not q.isascii():
             rows = [r for r in rows if any(
                 (str(x or "").lower().find(q) >= 0)
                 for x in (
@@ -169,56 +215,68 @@ class DoneTab(QWidget):
         self.table.setSortingEnabled(False)
         self.table.setRowCount(len(rows))
 
+        # Vorhandene Items und Zellwidgets werden weiterverwendet, nur neue Zeilen legen welche an
         for r, row in enumerate(rows):
+            case_id = int(row[0])
+            # jedes Datum nur einmal parsen: für die Tage und die Sortierschlüssel
+            dates = {self.COL_ABGABE: _parse_iso(row[self.COL_ABGABE]),
+                     self.COL_ZURUECK: _parse_iso(row[self.COL_ZURUECK])}
+
             # Textspalten bis vor die Aktionsspalten
             for c in range(self.COL_REOPEN):
                 val = row[c]
                 full_text = "" if val is None else str(val)
+                item = self.table.item(r, c)
+                if item is None:
+                    item = QTableWidgetItem()
+                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                    if c in (self.COL_TAGE, self.COL_ABGABE, self.COL_ZURUECK):
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                    else:
+                        item.setTextAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft)
+                    self.table.setItem(r, c, item)
 
                 if c == self.COL_TAGE:
                     # Tage zwischen Abgabe und Zurück (numerisch sortierbar)
-                    d1 = self._parse_iso(row[self.COL_ABGABE])
-                    d2 = self._parse_iso(row[self.COL_ZURUECK])
+                    d1, d2 = dates[self.COL_ABGABE], dates[self.COL_ZURUECK]
                     days = -1
                     tip = "Kein gültiges Datum"
                     if d1 and d2 and d2 >= d1:
                         days = (d2 - d1).days
                         tip = f"{days} Tag(e) zwischen Abgabe und Zurück"
-                    item = QTableWidgetItem()
                     item.setData(Qt.ItemDataRole.DisplayRole, int(days))
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                     item.setToolTip(tip)
                 else:
                     display = (full_text[:200] + "…") if (c == self.COL_NOTES and len(full_text) > 200) else full_text
-                    item = QTableWidgetItem(display)
+                    item.setText(display)
                     item.setToolTip(full_text)
-
                     if c in (self.COL_ABGABE, self.COL_ZURUECK):
-                        item.setData(Qt.ItemDataRole.UserRole, self._date_sort_key(full_text))
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    else:
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft)
-
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.table.setItem(r, c, item)
-
-            case_id = int(row[0])
+                        item.setData(Qt.ItemDataRole.UserRole, _date_sort_key(dates[c]))
 
             # Wieder öffnen?
-            chk = QCheckBox()
-            chk.setText("")
+            wrapper = self.table.cellWidget(r, self.COL_REOPEN)
+            chk = wrapper.findChild(QCheckBox) if wrapper is not None else None
+            if chk is None:
+                chk = QCheckBox()
+                chk.setText("")
+                chk.clicked.connect(self._on_reopen_clicked)
+                self.table.setCellWidget(r, self.COL_REOPEN, self._centered_widget(chk))
+            else:
+                chk.setChecked(False)
             chk.setEnabled(not self.read_only)
             chk.setProperty("case_id", case_id)
-            chk.clicked.connect(self._on_reopen_clicked)
-            self.table.setCellWidget(r, self.COL_REOPEN, self._centered_widget(chk))
 
             # Löschen (nur Admin)
             if self.is_admin:
-                btn = QPushButton()
-                btn.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon))
-                btn.setToolTip("Eintrag löschen")
-                btn.clicked.connect(lambda _=False, cid=case_id: self._on_delete(cid))
-                self.table.setCellWidget(r, self.COL_DELETE, self._centered_widget(btn))
+                wrapper = self.table.cellWidget(r, self.COL_DELETE)
+                btn = wrapper.findChild(QPushButton) if wrapper is not None else None
+                if btn is None:
+                    btn = QPushButton()
+                    btn.setIcon(self._trash_icon)
+                    btn.setToolTip("Eintrag löschen")
+                    btn.clicked.connect(self._on_delete_clicked)
+                    self.table.setCellWidget(r, self.COL_DELETE, self._centered_widget(btn))
+                btn.setProperty("case_id", case_id)
 
         # Spaltenbreiten nach Inhalt
         self.table.resizeColumnsToContents()
@@ -259,6 +317,7 @@ class DoneTab(QWidget):
             )
 
         try:
+            # WAL + synchronous=NORMAL (db._connect): der Commit wartet nicht auf fsync
             with self.conn:
                 self._ensure_case_columns(["status", "date_returned", "closed_by"])
                 self.conn.execute(
@@ -291,6 +350,12 @@ class DoneTab(QWidget):
             QTimer.singleShot(0, offline_reset)
 
     # ---------- Delete ----------
+    def _on_delete_clicked(self):
+        # ein Slot für alle Löschen-Buttons; der Fall steht als Property am Button
+        case_id = self.sender().property("case_id")
+        if case_id is not None:
+            self._on_delete(int(case_id))
+
     def _on_delete(self, case_id: int):
         if not self.is_admin:
             return
@@ -372,7 +437,7 @@ class DoneTab(QWidget):
         if not path:
             return
         try:
-            where_sql, params = self._scope_filter_sql()
+            where_sql, params = self._scope_clause, self._scope_params
             cur = self.conn.cursor()
             rows = cur.execute(
                 f"""
@@ -383,9 +448,10 @@ class DoneTab(QWidget):
                 ORDER BY id DESC
                 """,
                 params,
-            ).fetchall()
+            )
 
-            with open(path, "w", newline="", encoding="utf-8") as f:
+            # Zeilen direkt aus dem Cursor schreiben, ohne alle Fälle vorher zu laden
+            with open(path, "w", newline="", encoding="utf-8", buffering=1 << 16) as f:
                 w = csv.writer(f, delimiter=";")
                 w.writerow(["ID", "Klinik", "Gerät", "Wave- / Seriennummer", "Abgeber", "Techniker",
                             "Grund", "Abgabe", "Zurück"])
@@ -397,35 +463,13 @@ class DoneTab(QWidget):
 
     # ---------- Helpers ----------
     def _ensure_case_columns(self, names: list[str]) -> None:
-        cur = self.conn.cursor()
-        cur.execute("PRAGMA table_info(cases);")
-        existing = {row[1] for row in cur.fetchall()}
-        for n in names:
-            if n not in existing:
-                self.conn.execute(f"ALTER TABLE cases ADD COLUMN {n} TEXT")
+        ensure_case_columns(self.conn, names)
 
     def _after_reopen_success(self, case_id: int, device_label: str):
         self.case_reopened.emit(case_id)
         self.refresh()
         QMessageBox.information(self, "Geöffnet", f"Gerät „{device_label}“ wurde wieder geöffnet.")
 
-    def _date_sort_key(self, s: Optional[str]) -> int:
-        if not s:
-            return -10**9
-        try:
-            dt = datetime.fromisoformat(s.strip())
-            return (dt - datetime(1970, 1, 1)).days
-        except Exception:
-            return -10**9
-
-    def _parse_iso(self, s: Optional[str]) -> Optional[datetime]:
-        if not s:
-            return None
-        try:
-            return datetime.fromisoformat(s.strip())
-        except Exception:
-            return None
-
     def _device_label(self, case_id: int) -> str:
         try:
             cur = self.conn.cursor()
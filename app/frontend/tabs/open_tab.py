@@ -13,7 +13,7 @@ from PyQt6.QtWidgets import (
     QPushButton, QFileDialog, QSizePolicy, QStyle
 )
 
-from app.backend.helpers.helpers import clinics_of_user
+from app.backend.helpers.helpers import case_columns, clinics_of_user, ensure_case_columns
 from app.backend.helpers.buffer import enqueue_write
 
 DATE_INPUT_FORMATS = (
@@ -109,11 +109,9 @@ class OpenTab(QWidget):
     # ---------------- Schema / Meta ----------------
     def _detect_column_exprs(self) -> tuple[str, str]:
         try:
-            cur = self.conn.cursor()
-            cur.execute("PRAGMA table_info(cases);")
-            cols = {row[1] for row in cur.fetchall()}
+            cols = case_columns(self.conn)
         except Exception:
-            cols = set()
+            cols = frozenset()
         created_expr = "created_by" if "created_by" in cols else "''"
         notes_expr = "notes" if "notes" in cols else "''"
         return created_expr, notes_expr
@@ -454,16 +452,4 @@ class OpenTab(QWidget):
         return QBrush(QColor(220, 0, 0))
 
     def _ensure_case_columns(self, names: list[str]) -> None:
-        cur = self.conn.cursor()
-        cur.execute("PRAGMA table_info(cases);")
-        existing = {row[1] for row in cur.fetchall()}
-        for n in names:
-            if n not in existing:
-                if n == "status":
-                    self.conn.execute("ALTER TABLE cases ADD COLUMN status TEXT DEFAULT 'In Reparatur'")
-                elif n == "date_returned":
-                    self.conn.execute("ALTER TABLE cases ADD COLUMN date_returned TEXT")
-                elif n == "closed_by":
-                    self.conn.execute("ALTER TABLE cases ADD COLUMN closed_by TEXT")
-                else:
-                    self.conn.execute(f"ALTER TABLE cases ADD COLUMN {n} TEXT")
+        ensure_case_columns(self.conn, names)
@@ -171,13 +171,14 @@ class Main(QMainWindow):
         if not hasattr(self, "conn") or self.conn is None:
             return
         try:
+            # erst eigene Änderungen abschliessen: sync_buffer_once braucht eine Verbindung ohne offene Transaktion
             try:
-                sync_buffer_once(self.conn)
+                self.conn.commit()
             except Exception:
                 pass
 
             try:
-                self.conn.commit()
+                sync_buffer_once(self.conn)
             except Exception:
                 pass
 
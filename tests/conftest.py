@@ -1,4 +1,4 @@
-import sys, pathlib, sqlite3, pytest, bcrypt
+import gc, sys, pathlib, sqlite3, pytest, bcrypt
 
 # --- Projekt-Root importierbar machen ---
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -55,6 +55,16 @@ CREATE TABLE IF NOT EXISTS login_attempts (
 
 DEFAULT_CLINICS = ["Neuro", "Viszeral", "Thorax", "Ortho"]
 
+@pytest.hookimpl(trylast=True)
+def pytest_runtest_teardown(item):
+    # pytest-qt schließt Widgets nur per deleteLater(); ohne laufende Event-Loop werden sie nie
+    # wirklich gelöscht und bei späteren Tests (z. B. neues App-Stylesheet in Main) mit umgestylt.
+    from PyQt6.QtCore import QCoreApplication, QEvent
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+    # Python-Hüllen der gelöschten Widgets gleich hier einsammeln, nicht erst irgendwann
+    # mitten in der Event-Verarbeitung eines späteren Tests
+    gc.collect()
+
 @pytest.fixture(scope="session")
 def tmp_db_path(tmp_path_factory):
     return tmp_path_factory.mktemp("db") / "test_repairs.db"
@@ -87,6 +97,9 @@ def patch_db_auth_and_buffer(tmp_db_path, monkeypatch, tmp_path):
     monkeypatch.setattr(real_db, "list_clinics", list_clinics, raising=False)
     monkeypatch.setattr(real_db, "add_clinic", add_clinic, raising=False)
     monkeypatch.setattr(real_db, "delete_clinic", delete_clinic, raising=False)
+    # zwischengespeicherte Klinikliste stammt ggf. aus der DB eines früheren Tests
+    if hasattr(real_db, "invalidate_clinics_cache"):
+        real_db.invalidate_clinics_cache()
 
     # auth-Funktionen auf Test-DB umbiegen (mit bcrypt wie in der App)
     from app.backend import auth as real_auth
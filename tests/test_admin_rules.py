@@ -1,6 +1,11 @@
 # test_admin_tab_permissions.py
 import pytest
 
+import app.backend.db.db as _db_mod
+
+# echte Thread-Verbindung; conftest ersetzt db.get_conn erst zur Laufzeit
+real_get_conn = _db_mod.get_conn
+
 # Robust import: unterstützt beide möglichen Modulpfade (app.frontend.tabs vs app.tabs)
 try:
     from app.frontend.tabs.admin_tab import AdminTab  # alter Pfad
@@ -52,3 +57,203 @@ def test_admin_cannot_delete_self(qtbot, conn):
 
     count = conn.execute("SELECT COUNT(*) FROM users WHERE id=1").fetchone()[0]
     assert count == 1, "Eigenlöschung des Admins darf nicht möglich sein"
+
+# echte Implementierung; conftest ersetzt db.delete_clinic erst zur Laufzeit durch eine Test-Impl
+from app.backend.db.db import delete_clinic as real_delete_clinic
+
+
+def test_delete_clinic_cleans_user_rights(conn):
+    conn.execute("INSERT INTO clinics(name) VALUES('Herz')")
+    conn.executemany(
+        "INSERT INTO users(id, username, password_hash, role, clinics) VALUES(?,?,x'00','Viewer',?)",
+        [
+            (20, "leerzeichen", "Neuro, Herz"),
+            (21, "verdreht", " Herz ,Neuro"),
+            (22, "doppelt", "Neuro,Herz,Herz"),
+            (23, "aehnlich", "Herzchirurgie,Neuro"),
+        ],
+    )
+    conn.commit()
+
+    real_delete_clinic("Herz")
+
+    rows = dict(conn.execute("SELECT id, clinics FROM users WHERE id BETWEEN 20 AND 23").fetchall())
+    assert rows == {20: "Neuro", 21: "Neuro", 22: "Neuro", 23: "Herzchirurgie,Neuro"}
+    assert conn.execute("SELECT COUNT(*) FROM clinics WHERE name='Herz'").fetchone()[0] == 0
+
+    conn.execute("DELETE FROM users WHERE id BETWEEN 20 AND 23")
+    conn.commit()
+
+
+def test_audit_sort_keeps_selection_and_truncates_details(qtbot, conn):
+    from PyQt6.QtCore import Qt
+
+    tab = AdminTab(conn, current_user_id=1)
+    qtbot.addWidget(tab)
+    model = tab.audit_model
+    long_details = "x" * 500
+    model.set_rows([
+        (1, "2024-01-01", "admin", "b_aktion", "user", 5, long_details),
+        (2, "2024-01-02", "admin", "c_aktion", "user", 6, "{}"),
+        (3, "2024-01-03", "admin", "a_aktion", "user", 7, "{}"),
+    ])
+
+    # Zeile mit ID 1 auswählen, dann nach Aktion sortieren: Auswahl muss mitwandern
+    row_of_1 = next(r for r in range(model.rowCount()) if model.index(r, 0).data() == "1")
+    tab.audit_table.selectRow(row_of_1)
+    model.sort(3, Qt.SortOrder.AscendingOrder)
+
+    selected = tab.audit_table.selectionModel().selectedRows()
+    assert [model.index(i.row(), 0).data() for i in selected] == ["1"]
+
+    details = model.index(selected[0].row(), model.DETAILS_COL)
+    assert len(details.data()) == model.DETAILS_MAX_CHARS + 1
+    assert details.data(Qt.ItemDataRole.ToolTipRole) == long_details
+
+
+def test_audit_search_fulltext_matches_plain_filter(qtbot, conn):
+    import app.backend.db.db as real_db
+
+    with conn:
+        real_db._init_audit_search(conn)
+        conn.executemany(
+            "INSERT INTO audit_log(user_id, action, entity, entity_id, details) VALUES(?,?,?,?,?)",
+            [
+                (2, "case_update", "case", 4711, '{"status":"Abgeschlossen"}'),
+                (3, "login_failure", "user", None, '{"username":"viewer"}'),
+                (None, "clinic_create", "clinic", None, '{"name":"Kardiologie"}'),
+            ],
+        )
+
+    tab = AdminTab(conn, current_user_id=1)
+    qtbot.addWidget(tab)
+    assert tab._audit_fts
+
+    for q in ("ABGESCHL", "tech", "clinic_cr", "kardio", "471", "ca"):
+        tab._audit_fts = True
+        tab.audit_search.setText(q)
+        qtbot.waitUntil(lambda: not tab._audit_debounce.isActive())
+        indexed = [r[0] for r in tab.audit_model._rows]
+        tab._audit_fts = False
+        tab.refresh_audit()
+        plain = [r[0] for r in tab.audit_model._rows]
+        assert indexed == plain, q
+        assert plain, q
+
+
+def test_audit_more_loads_next_page(qtbot, conn, monkeypatch):
+    import app.frontend.tabs.admin_tab as admin_mod
+    monkeypatch.setattr(admin_mod, "AUDIT_PAGE_SIZE", 2, raising=True)
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO audit_log(action, entity, details) VALUES(?,?,?)",
+            [("paging_test", "test", '{"n":%d}' % n) for n in range(5)],
+        )
+    expected = [r[0] for r in conn.execute("SELECT id FROM audit_log WHERE action='paging_test' ORDER BY id DESC")]
+
+    tab = AdminTab(conn, current_user_id=1)
+    qtbot.addWidget(tab)
+    tab.audit_search.setText("paging_test")
+    tab.refresh_audit()
+
+    loaded = lambda: [r[0] for r in tab.audit_model._rows]
+    assert loaded() == expected[:2]
+    tab._on_audit_more()
+    assert loaded() == expected[:4]
+    tab._on_audit_more()
+    assert loaded() == expected
+    assert not tab.btn_audit_more.isEnabled()
+
+    # gleiches Ergebnis über den einfachen Filter ohne Volltextindex
+    tab._audit_fts = False
+    tab.refresh_audit()
+    tab._on_audit_more()
+    tab._on_audit_more()
+    assert loaded() == expected
+
+
+def test_audit_page_fetches_details_prefix_only(qtbot, conn):
+    from PyQt6.QtCore import Qt
+
+    long_details = '{"preview":"' + "y" * 400 + '"}'
+    with conn:
+        audit_id = conn.execute(
+            "INSERT INTO audit_log(action, entity, details) VALUES('prefix_test', 'test', ?)", (long_details,)
+        ).lastrowid
+
+    tab = AdminTab(conn, current_user_id=1)
+    qtbot.addWidget(tab)
+    tab.audit_search.setText("prefix_test")
+    tab.refresh_audit()
+
+    model = tab.audit_model
+    assert [r[0] for r in model._rows] == [audit_id]
+    assert len(model._rows[0][model.DETAILS_COL]) == model.DETAILS_MAX_CHARS + 1
+    details = model.index(0, model.DETAILS_COL)
+    assert details.data() == long_details[:model.DETAILS_MAX_CHARS] + "…"
+    assert details.data(Qt.ItemDataRole.ToolTipRole) == long_details
+
+    # der Python-Filter sucht auch hinter der Kürzung
+    tab._audit_fts = False
+    tab.audit_search.setText("yyy\"}")
+    tab.refresh_audit()
+    assert [r[0] for r in model._rows] == [audit_id]
+
+    conn.execute("DELETE FROM audit_log WHERE id=?", (audit_id,))
+    conn.commit()
+
+
+def test_prune_audit_log_keeps_newest():
+    import sqlite3
+    import app.backend.db.db as real_db
+
+    c = sqlite3.connect(":memory:")
+    c.execute("CREATE TABLE audit_log(id INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT)")
+    c.executemany("INSERT INTO audit_log(action) VALUES(?)", [(f"a{n}",) for n in range(10)])
+    c.commit()
+    ids = lambda: [r[0] for r in c.execute("SELECT id FROM audit_log ORDER BY id")]
+
+    assert real_db.prune_audit_log(c, keep=10) == 0
+    assert real_db.prune_audit_log(c, keep=7) == 3      # schon knapp über keep wird gekürzt
+    assert ids() == list(range(4, 11))
+    assert real_db.prune_audit_log(c, keep=20) == 0
+    assert real_db.prune_audit_log(c, keep=0) == 7
+    assert ids() == []
+    c.close()
+
+
+def test_get_conn_closes_connection_of_previous_path(tmp_path, monkeypatch):
+    import sqlite3
+
+    monkeypatch.setattr(_db_mod, "DB_PATH", tmp_path / "erste.db", raising=True)
+    first = real_get_conn()
+    assert real_get_conn() is first
+
+    monkeypatch.setattr(_db_mod, "DB_PATH", tmp_path / "zweite.db", raising=True)
+    second = real_get_conn()
+    try:
+        assert second is not first
+        with pytest.raises(sqlite3.ProgrammingError):
+            first.execute("SELECT 1")
+    finally:
+        _db_mod._close_thread_conn()
+
+
+def test_new_clinic_checkbox_follows_all_state(qtbot, conn):
+    tab = AdminTab(conn, current_user_id=1)
+    qtbot.addWidget(tab)
+    tab._rebuild_clinic_checkboxes()
+    tab.chk_all_add.setChecked(True)
+    assert tab.chk_add and not any(cb.isEnabled() for cb in tab.chk_add.values())
+
+    with conn:
+        conn.execute("INSERT INTO clinics(name) VALUES('Zz Neu')")
+    tab._rebuild_clinic_checkboxes()
+
+    new_box = tab.chk_add["Zz Neu"]
+    assert not new_box.isEnabled() and not new_box.isChecked()
+    assert all(cb.isEnabled() for cb in tab.chk_edit.values())   # Bearbeiten-Formular ohne "Alle"
+
+    conn.execute("DELETE FROM clinics WHERE name='Zz Neu'")
+    conn.commit()
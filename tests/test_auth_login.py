@@ -0,0 +1,199 @@
+# test_auth_login.py
+import hashlib, sqlite3, threading, time
+import bcrypt
+import pytest
+
+import app.backend.auth as auth_mod
+
+# echte Anmeldung; conftest ersetzt auth.authenticate erst zur Laufzeit durch eine Test-Impl
+real_authenticate = auth_mod.authenticate
+
+FAST_ROUNDS = 4  # echte bcrypt-Prüfungen, aber schnell genug für viele Versuche
+
+
+@pytest.fixture
+def auth_db(tmp_db_path, monkeypatch):
+    """Leitet auth.py auf die Test-DB um und legt einen Benutzer mit günstigem Hash an."""
+    def get_conn_override():
+        return sqlite3.connect(tmp_db_path)
+
+    monkeypatch.setattr(auth_mod, "get_conn", get_conn_override, raising=True)
+    monkeypatch.setattr(auth_mod, "BCRYPT_ROUNDS", FAST_ROUNDS, raising=True)
+    auth_mod._dummy_hash.cache_clear()
+    auth_mod._dummy_verify_seconds.cache_clear()
+    auth_mod.clear_verify_cache()
+
+    with get_conn_override() as c:
+        c.execute(
+            "INSERT OR REPLACE INTO users(id, username, password_hash, role, clinics) "
+            "VALUES(10, 'fast', ?, 'Viewer', 'Neuro')",
+            (bcrypt.hashpw(b"richtig123", bcrypt.gensalt(rounds=FAST_ROUNDS)),),
+        )
+        c.execute("DELETE FROM login_attempts")
+
+    yield get_conn_override
+
+    auth_mod._flush_failed_attempts()
+    auth_mod._dummy_hash.cache_clear()
+    auth_mod._dummy_verify_seconds.cache_clear()
+    auth_mod.clear_verify_cache()
+
+
+def test_wrong_password_costs_like_unknown_user(auth_db, monkeypatch):
+    checks, dummies = [], []
+    real_checkpw, real_dummy = bcrypt.checkpw, auth_mod._dummy_verify
+
+    def counting_checkpw(pw, hashed):
+        checks.append(pw)
+        return real_checkpw(pw, hashed)
+
+    def counting_dummy(pw):
+        dummies.append(pw)
+        real_dummy(pw)
+
+    monkeypatch.setattr(auth_mod.bcrypt, "checkpw", counting_checkpw, raising=True)
+    monkeypatch.setattr(auth_mod, "_dummy_verify", counting_dummy, raising=True)
+    verify_seconds = auth_mod._dummy_verify_seconds()
+    checks.clear()
+
+    def timed(username):
+        start = time.perf_counter()
+        assert real_authenticate(username, "falsch") is None
+        return time.perf_counter() - start
+
+    # Wiederholte Fehlversuche dürfen nicht aus einem Cache beantwortet werden
+    known = [timed("fast") for _ in range(3)]
+    unknown = [timed("gibt_es_nicht") for _ in range(3)]
+
+    assert len(checks) == 3
+    assert len(dummies) == 3
+    assert min(known) >= verify_seconds * 0.5
+    assert min(unknown) >= verify_seconds * 0.5
+
+
+def test_successful_login_is_cached(auth_db, monkeypatch):
+    checks = []
+    real_checkpw = bcrypt.checkpw
+
+    def counting_checkpw(pw, hashed):
+        checks.append(pw)
+        return real_checkpw(pw, hashed)
+
+    monkeypatch.setattr(auth_mod.bcrypt, "checkpw", counting_checkpw, raising=True)
+
+    assert real_authenticate("fast", "richtig123") == (10, "Viewer", "Neuro")
+    assert real_authenticate("fast", "richtig123") == (10, "Viewer", "Neuro")
+    assert len(checks) == 1
+
+    # Der Cache enthält keine nachrechenbaren Passwort-Digests
+    digest = hashlib.sha256(b"richtig123").digest()
+    assert all(key[1] != digest for key in auth_mod._verify_cache)
+
+
+def _stored_attempts(get_conn, user_id):
+    with get_conn() as c:
+        return c.execute("SELECT COUNT(*) FROM login_attempts WHERE user_id=?", (user_id,)).fetchone()[0]
+
+
+def test_buffered_failures_lock_out(auth_db):
+    for _ in range(auth_mod.MAX_FAILED_ATTEMPTS):
+        assert real_authenticate("fast", "falsch") is None
+
+    # Noch nicht geschriebene Fehlversuche zählen mit: auch das richtige Passwort wird abgewiesen
+    assert real_authenticate("fast", "richtig123") is None
+    with auth_db() as c:
+        actions = [r[0] for r in c.execute("SELECT action FROM audit_log WHERE user_id=10 ORDER BY id")]
+    assert actions[-1] == "login_blocked"
+
+    auth_mod._flush_failed_attempts()
+    assert _stored_attempts(auth_db, 10) == auth_mod.MAX_FAILED_ATTEMPTS
+    assert real_authenticate("fast", "richtig123") is None
+
+
+def test_background_flush_writes_attempts(auth_db, monkeypatch):
+    monkeypatch.setattr(auth_mod, "_ATTEMPT_FLUSH_SECONDS", 0.05, raising=True)
+
+    for expected in (1, 2):
+        assert real_authenticate("fast", "falsch") is None
+        deadline = time.monotonic() + 5
+        while _stored_attempts(auth_db, 10) < expected and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _stored_attempts(auth_db, 10) == expected
+        worker = auth_mod._attempt_worker
+        assert worker is not None and worker.is_alive()
+
+    # immer derselbe Thread, also auch dieselbe Verbindung
+    assert auth_mod._attempt_worker is worker
+
+    # Erfolg löscht gespeicherte und vorgemerkte Fehlversuche
+    assert real_authenticate("fast", "richtig123") == (10, "Viewer", "Neuro")
+    assert _stored_attempts(auth_db, 10) == 0
+    assert auth_mod._pending_failed_attempts(10, 0) == 0
+
+
+def _block_flush_writes(auth_db, monkeypatch):
+    """Lässt Flushes im Thread "flush" vor dem Schreiben warten, bis release gesetzt ist."""
+    in_flush, release = threading.Event(), threading.Event()
+
+    class SlowConn:
+        def __init__(self, real):
+            self._real = real
+
+        def executemany(self, sql, params):
+            in_flush.set()
+            release.wait(5)
+            return self._real.executemany(sql, params)
+
+        def __getattr__(self, name):
+            return getattr(self._real, name)
+
+        def __enter__(self):
+            self._real.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self._real.__exit__(*exc)
+
+    def get_conn_slow_flush():
+        conn = auth_db()
+        return SlowConn(conn) if threading.current_thread().name == "flush" else conn
+
+    monkeypatch.setattr(auth_mod, "get_conn", get_conn_slow_flush, raising=True)
+    return in_flush, release
+
+
+def _login_during_blocked_flush(in_flush, release, password):
+    flush = threading.Thread(target=auth_mod._flush_failed_attempts, name="flush")
+    flush.start()
+    assert in_flush.wait(5)
+
+    result = []
+    login = threading.Thread(target=lambda: result.append(real_authenticate("fast", password)))
+    login.start()
+    time.sleep(0.2)  # Anmeldung wartet jetzt auf den laufenden Flush
+    release.set()
+    flush.join(5)
+    login.join(5)
+    return result
+
+
+def test_success_waits_for_running_flush(auth_db, monkeypatch):
+    """Ein Flush, der die Fehlversuche schon übernommen hat, darf sie nicht nach dem Löschen schreiben."""
+    in_flush, release = _block_flush_writes(auth_db, monkeypatch)
+
+    auth_mod._record_failed_attempt(10)
+    auth_mod._record_failed_attempt(10)
+
+    assert _login_during_blocked_flush(in_flush, release, "richtig123") == [(10, "Viewer", "Neuro")]
+    assert _stored_attempts(auth_db, 10) == 0
+
+
+def test_lockout_counts_attempts_of_running_flush(auth_db, monkeypatch):
+    """Versuche, die ein Flush gerade schreibt, stehen weder im Puffer noch in der DB: trotzdem sperren."""
+    in_flush, release = _block_flush_writes(auth_db, monkeypatch)
+
+    for _ in range(auth_mod.MAX_FAILED_ATTEMPTS):
+        auth_mod._record_failed_attempt(10)
+
+    assert _login_during_blocked_flush(in_flush, release, "richtig123") == [None]
+    assert _stored_attempts(auth_db, 10) == auth_mod.MAX_FAILED_ATTEMPTS
@@ -0,0 +1,155 @@
+# test_buffer_jsonl.py
+import json, os, pathlib, sqlite3
+import pytest
+
+import app.backend.helpers.buffer as buffer_mod
+from app.backend.helpers.buffer import enqueue_write, sync_buffer_once
+
+
+def _case(device: str, status: str = "In Reparatur") -> dict:
+    return {
+        "type": "insert_case",
+        "clinic": "Neuro",
+        "device_name": device,
+        "status": status,
+        "date_submitted": "2024-01-01",
+    }
+
+
+@pytest.fixture
+def buf_path(tmp_path, monkeypatch):
+    """Pufferdatei im JSONL-Format; das alte Format liegt daneben als .json."""
+    p = tmp_path / "buffer_queue.jsonl"
+    monkeypatch.setattr(buffer_mod, "_buffer_path", lambda: p, raising=True)
+    return p
+
+
+def _entries():
+    return list(buffer_mod._iter_buffer())
+
+
+def test_legacy_json_is_migrated(buf_path):
+    old_entries = [_case("Alt 1"), _case("Alt 2")]
+    legacy = buf_path.with_suffix(".json")
+    legacy.write_text(
+        json.dumps({"entries": old_entries, "hash": buffer_mod._calc_legacy_hash(old_entries)}),
+        encoding="utf-8",
+    )
+    buf_path.write_bytes(buffer_mod._encode_line(_case("Neu")))
+
+    assert [e["device_name"] for e in _entries()] == ["Alt 1", "Alt 2", "Neu"]
+    assert not legacy.exists()
+
+
+def test_invalid_legacy_json_is_set_aside(buf_path):
+    legacy = buf_path.with_suffix(".json")
+    legacy.write_text(json.dumps({"entries": [_case("Alt")], "hash": "falsch"}), encoding="utf-8")
+
+    assert _entries() == []
+    assert not legacy.exists()
+    assert legacy.with_suffix(".json.corrupt").exists()
+
+
+def test_corrupt_and_torn_lines_are_set_aside(buf_path, monkeypatch):
+    good_1, good_2 = buffer_mod._encode_line(_case("Gut 1")), buffer_mod._encode_line(_case("Gut 2"))
+    tampered = buffer_mod._encode_line(_case("Verändert")).replace(b"Neuro", b"Ortho")
+    buf_path.write_bytes(good_1 + b"kein json\n" + tampered + good_2 + good_1[:20])
+
+    # Die Pufferdatei darf beim Ersetzen nicht mehr offen sein (Windows: PermissionError)
+    real_write_atomic = buffer_mod._write_atomic
+    open_while_replacing = []
+
+    def checking_write_atomic(p, chunks):
+        fd_dir = pathlib.Path("/proc/self/fd")
+        if fd_dir.exists():
+            targets = []
+            for fd in fd_dir.iterdir():
+                try:
+                    targets.append(os.readlink(fd))
+                except OSError:
+                    pass
+            open_while_replacing.extend(t for t in targets if t == str(p))
+        real_write_atomic(p, chunks)
+
+    monkeypatch.setattr(buffer_mod, "_write_atomic", checking_write_atomic, raising=True)
+
+    assert [e["device_name"] for e in _entries()] == ["Gut 1", "Gut 2"]
+    assert open_while_replacing == []
+
+    corrupt = buf_path.with_name(buf_path.name + ".corrupt")
+    assert len(corrupt.read_bytes().splitlines()) == 3
+    assert buf_path.read_bytes() == good_1 + good_2
+
+    # zweites Lesen findet nichts Neues mehr
+    assert len(_entries()) == 2
+    assert len(corrupt.read_bytes().splitlines()) == 3
+
+
+def test_append_after_torn_line_starts_new_line(buf_path):
+    good = buffer_mod._encode_line(_case("Gut"))
+    buf_path.write_bytes(good + good[:30])
+
+    enqueue_write(_case("Danach"))
+
+    assert [e["device_name"] for e in _entries()] == ["Gut", "Danach"]
+
+
+def test_busy_database_keeps_buffer(buf_path, conn, tmp_db_path, monkeypatch):
+    enqueue_write(_case("Busy 1"))
+    enqueue_write(_case("Busy 2"))
+    before = buf_path.read_bytes()
+
+    def tune_without_wait(c):
+        c.execute("PRAGMA busy_timeout=0;")
+
+    monkeypatch.setattr(buffer_mod, "_tune_conn", tune_without_wait, raising=True)
+
+    other = sqlite3.connect(tmp_db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert sync_buffer_once(conn) == (0, 2)
+    finally:
+        other.rollback()
+        other.close()
+    assert buf_path.read_bytes() == before
+
+    assert sync_buffer_once(conn) == (2, 0)
+    assert not buf_path.exists()
+
+
+def test_invalid_entry_falls_back_to_single_entries(buf_path, conn):
+    enqueue_write(_case("Einzeln 1"))
+    enqueue_write(_case("Einzeln 2", status="Kaputt"))   # verletzt CHECK(status ...)
+    enqueue_write(_case("Einzeln 3"))
+    enqueue_write({"type": "unbekannt"})
+
+    assert sync_buffer_once(conn) == (2, 2)
+
+    names = [r[0] for r in conn.execute(
+        "SELECT device_name FROM cases WHERE device_name LIKE 'Einzeln %' ORDER BY id"
+    )]
+    assert names == ["Einzeln 1", "Einzeln 3"]
+    assert [e.get("device_name", e["type"]) for e in _entries()] == ["Einzeln 2", "unbekannt"]
+
+    conn.execute("DELETE FROM cases WHERE device_name LIKE 'Einzeln %'")
+    conn.commit()
+
+
+def test_open_transaction_skips_sync(buf_path, conn):
+    enqueue_write(_case("Offen 1"))
+    enqueue_write(_case("Offen 2"))
+    before = buf_path.read_bytes()
+
+    conn.execute("INSERT INTO clinics(name) VALUES('Offene Transaktion')")
+    assert conn.in_transaction
+    assert sync_buffer_once(conn) == (0, 2)
+
+    # die Änderung des Aufrufers ist weder festgeschrieben noch verworfen
+    assert conn.in_transaction
+    assert buf_path.read_bytes() == before
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM clinics WHERE name='Offene Transaktion'").fetchone()[0] == 0
+
+    assert sync_buffer_once(conn) == (2, 0)
+    conn.execute("DELETE FROM cases WHERE device_name LIKE 'Offen %'")
+    conn.commit()
@@ -52,11 +52,26 @@ def _read_buffer_entries(buf_path: pathlib.Path):
     """
     Liest den Buffer robust ein.
     Unterstützt:
+        - JSONL: eine Zeile pro Entry: {"hash": "...", "entry": {...}}
         - Liste von Entries: [ {...}, ... ]
         - Dict mit 'entries' + optionalem 'hash': { "entries": [...], "hash": "..." }
+    Eine fehlende Datei gilt als leerer Buffer (wird nach vollständigem Sync entfernt).
     Rückgabe: (entries_list, full_obj)
     """
-    raw = json.loads(buf_path.read_text(encoding="utf-8"))
+    if not buf_path.exists():
+        return [], {"entries": []}
+    text = buf_path.read_text(encoding="utf-8")
+    if not text.strip():
+        return [], {"entries": []}
+    try:
+        raw = json.loads(text)
+    except json.JSONDecodeError:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(raw, dict) and "entry" in raw:
+        raw = [raw]
+    if isinstance(raw, list) and raw and all(isinstance(r, dict) and "entry" in r for r in raw):
+        entries = [r["entry"] for r in raw]
+        return entries, {"entries": entries}
     if isinstance(raw, dict) and "entries" in raw:
         return raw["entries"], raw
     elif isinstance(raw, list):
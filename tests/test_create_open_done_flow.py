@@ -1,6 +1,8 @@
 # test_create_open_done_flow.py
+from datetime import datetime
+
 from PyQt6.QtCore import QDate, Qt
-from PyQt6.QtWidgets import QCheckBox
+from PyQt6.QtWidgets import QCheckBox, QPushButton
 
 # Robuste Importe mit Fallbacks
 try:
@@ -172,4 +174,126 @@ def test_flow_create_complete_reopen(qtbot, conn):
             col_wave_open:   lambda t: t.startswith(wave_val_prefix),
         },
     )
-    assert row_open_again >= 0
\ No newline at end of file
+    assert row_open_again >= 0
+
+def test_done_search_filters_in_sql_and_python(qtbot, conn):
+    with conn:
+        conn.executemany(
+            "INSERT INTO cases(clinic, device_name, wave_number, status, reason, date_submitted, date_returned, notes) "
+            "VALUES(?,?,?,'Abgeschlossen',?,?,?,?)",
+            [
+                ("Viszeral", "Kühlbox", "SUCH-1", "Deckel", "2024-01-01", "2024-01-05", None),
+                ("Thorax", "Monitor", "SUCH-2", "Display ÖL", "2024-02-01", "2024-02-03", "Notiz ABC"),
+                ("Neuro", "Monitor", "SUCH-3", "Kabel", "2024-03-01", "2024-03-02", None),
+            ],
+        )
+
+    done_tab = DoneTab(conn, role="Techniker", clinics_csv="Viszeral,Thorax")
+    qtbot.addWidget(done_tab)
+    col_wave = _col_index_by_header_contains(done_tab.table, "wave", "serien")
+
+    def waves(q):
+        done_tab.search.setText(q)
+        done_tab.refresh()
+        return sorted(
+            done_tab.table.item(r, col_wave).text()
+            for r in range(done_tab.table.rowCount())
+            if done_tab.table.item(r, col_wave).text().startswith("SUCH-")
+        )
+
+    assert waves("such-") == ["SUCH-1", "SUCH-2"]      # Klinik Neuro liegt außerhalb des Sichtbereichs
+    assert waves("monitor") == ["SUCH-2"]
+    assert waves("notiz abc") == ["SUCH-2"]
+    assert waves("kühl") == ["SUCH-1"]                 # Umlaut: Python-Filter
+    assert waves("öl") == ["SUCH-2"]
+    assert waves("2024-01-05") == ["SUCH-1"]
+    assert waves("kabel") == []
+
+    # Tippen startet nur den Timer, die Tabelle folgt nach der Pause
+    done_tab.search.setText("kühlbox")
+    assert done_tab._search_timer.isActive()
+    qtbot.waitUntil(lambda: not done_tab._search_timer.isActive())
+    assert done_tab.table.rowCount() == 1
+
+    conn.execute("DELETE FROM cases WHERE wave_number LIKE 'SUCH-%'")
+    conn.commit()
+
+
+def test_done_refresh_reuses_rows(qtbot, conn):
+    with conn:
+        ids = [
+            conn.execute(
+                "INSERT INTO cases(clinic, device_name, wave_number, status, date_submitted, date_returned) "
+                "VALUES('Viszeral', ?, ?, 'Abgeschlossen', '2024-01-01', ?)",
+                (f"Gerät {n}", f"REUSE-{n}", f"2024-01-0{n + 2}"),
+            ).lastrowid
+            for n in range(3)
+        ]
+
+    done_tab = DoneTab(conn, role="Admin", clinics_csv="ALL")
+    qtbot.addWidget(done_tab)
+    col_wave = _col_index_by_header_contains(done_tab.table, "wave", "serien")
+    col_reopen = _col_index_by_header_contains(done_tab.table, "wieder öffnen")
+
+    def row_of(wave):
+        t = done_tab.table
+        return next(r for r in range(t.rowCount()) if t.item(r, col_wave).text() == wave)
+
+    first_box = _find_checkbox(done_tab.table.cellWidget(0, col_reopen))
+    done_tab.search.setText("reuse-1")
+    done_tab.refresh()
+
+    t = done_tab.table
+    assert t.rowCount() == 1
+    assert _find_checkbox(t.cellWidget(0, col_reopen)) is first_box
+    assert first_box.property("case_id") == ids[1]
+    delete_btn = t.cellWidget(0, t.columnCount() - 1).findChild(QPushButton)
+    assert delete_btn.property("case_id") == ids[1]
+
+    done_tab.search.setText("reuse-")
+    done_tab.refresh()
+    for n, case_id in enumerate(ids):
+        r = row_of(f"REUSE-{n}")
+        assert _find_checkbox(t.cellWidget(r, col_reopen)).property("case_id") == case_id
+        assert t.cellWidget(r, t.columnCount() - 1).findChild(QPushButton).property("case_id") == case_id
+
+    # alle Löschen-Buttons teilen sich einen Slot, der den Fall aus der Property liest
+    deleted = []
+    done_tab._on_delete = deleted.append
+    t.cellWidget(row_of("REUSE-2"), t.columnCount() - 1).findChild(QPushButton).click()
+    assert deleted == [ids[2]]
+
+    conn.execute("DELETE FROM cases WHERE wave_number LIKE 'REUSE-%'")
+    conn.commit()
+
+
+def test_case_columns_not_shared_across_connections(tmp_path):
+    import sqlite3
+    import app.backend.helpers.helpers as helpers
+
+    old = sqlite3.connect(tmp_path / "alt.db")
+    old.execute("CREATE TABLE cases(id INTEGER PRIMARY KEY, created_by TEXT)")
+    assert "created_by" in helpers.case_columns(old)
+    old.close()
+    del old  # id darf jetzt neu vergeben werden
+
+    new = sqlite3.connect(tmp_path / "neu.db")
+    try:
+        new.execute("CREATE TABLE cases(id INTEGER PRIMARY KEY)")
+        assert helpers.case_columns(new) == {"id"}
+        helpers.ensure_case_columns(new, ["created_by"])
+        assert "created_by" in helpers.case_columns(new)
+        # geschlossene Verbindungen hält der Cache nicht fest
+        for c, _cols in helpers._CASE_COLUMNS.values():
+            c.total_changes
+    finally:
+        new.close()
+
+
+def test_done_parse_iso_accepts_compact_dates():
+    from app.frontend.tabs.done_tab import _parse_iso
+
+    assert _parse_iso("20240101") == datetime(2024, 1, 1)
+    assert _parse_iso(" 2024-01-01 ") == datetime(2024, 1, 1)
+    assert _parse_iso("") is None and _parse_iso("   ") is None
+    assert _parse_iso("01.01.2024") is None and _parse_iso(None) is None